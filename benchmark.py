@@ -0,0 +1,284 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+
+import database
+from database import DatabaseManager
+from importer import iter_rows, iter_word_pairs
+from wordpack import WordPack, write_pack
+
+# --- 数据库基准测试（无界面，不依赖 Kivy）---
+# 用法:
+#   python benchmark.py suite --sizes 10000,100000,1000000 --out bench.json [--compare old.json] [--cache DIR]
+#   python benchmark.py random --words 300000 --batch 20     # 旧的 ORDER BY RANDOM() 与拒绝采样对比
+# suite 为每个规模生成合成词库，逐项计时并把结果写成 JSON，--compare 与之前某次提交的结果逐项对比
+
+LEGACY_RANDOM_QUERY = ("SELECT w.id, w.english, w.chinese, p.status FROM words w JOIN progress.word_progress p ON p.word_id = w.id "
+                       "JOIN progress.library_progress g ON g.library_id = w.library_id JOIN libraries l ON w.library_id = l.id "
+                       "WHERE p.status IN (0, 1) AND g.is_active = 1 AND l.deleted = 0 ORDER BY RANDOM() LIMIT ?")
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+CJK_POOL = [chr(c) for c in range(0x4e00, 0x4e00 + 3500)]
+# 比较时中位数变慢超过这个倍数、且至少慢 REGRESSION_MIN_MS 才标记出来（亚毫秒级的项目抖动很大）
+REGRESSION_RATIO = 1.2
+REGRESSION_MIN_MS = 0.1
+
+
+# --- 合成数据 ---
+
+def synthetic_pairs(rng, count, tag=''):
+    # 随机字母 + 序号保证同一词库内英文不重复；释义为词性前缀 + 2~6 个随机汉字
+    for i in range(count):
+        english = ''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 9))) + f"{tag}{i:x}"
+        chinese = rng.choice(('n. ', 'v. ', 'adj. ', '')) + ''.join(rng.choice(CJK_POOL) for _ in range(rng.randint(2, 6)))
+        yield english, chinese
+
+
+def build_db(path, total, libraries=10, inactive=2, mastered_ratio=0.3, seed=1):
+    # 约 mastered_ratio 的单词已掌握（排在未来），其余在新词 / 待复习（已到期）之间平分；
+    # 状态按 id 散列决定，同样的参数总得到同样的库
+    rng = random.Random(seed)
+    db = DatabaseManager(path)
+    per_lib = total // libraries
+    for li in range(libraries):
+        lib_id = db.add_library(f"lib{li}")
+        db.bulk_add_words(synthetic_pairs(rng, per_lib, f"_{li}_"), lib_id)
+        if li < inactive: db.toggle_library_status(lib_id, False)
+    mastered = int(mastered_ratio * 100)
+    now = int(time.time())
+    bucket = "((word_id * 2654435761) % 100)"
+    db.cursor.execute(f"UPDATE progress.word_progress SET status = CASE WHEN {bucket} < {mastered} THEN 2 WHEN {bucket} % 2 = 0 THEN 1 ELSE 0 END")
+    db.cursor.execute("UPDATE progress.word_progress SET due_at = ? - word_id % 86400, interval_days = 1 WHERE status = 1", (now,))
+    db.cursor.execute("UPDATE progress.word_progress SET due_at = ? + 86400 * (1 + word_id % 30), interval_days = 21, reps = 3 WHERE status = 2", (now,))
+    db.conn.commit()
+    return db
+
+
+def write_csv(path, rows, seed=2):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['英文', '中文'])
+        writer.writerows(synthetic_pairs(random.Random(seed), rows, '_csv_'))
+
+
+def write_xlsx(path, rows, seed=3):
+    # 没装 openpyxl 时返回 False，跳过 XLSX 相关项目
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        return False
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['英文', '中文'])
+    for pair in synthetic_pairs(random.Random(seed), rows, '_xlsx_'): ws.append(pair)
+    wb.save(path)
+    return True
+
+
+def write_wpk(path, rows, seed=5):
+    write_pack(path, 'bench', synthetic_pairs(random.Random(seed), rows, '_wpk_'))
+
+
+# --- 计时 ---
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(int(len(samples) * 0.95) - 1, 0)]
+
+
+def record(results, name, fn, repeat):
+    median, p95 = timed(fn, repeat)
+    results[name] = {'median_ms': round(median, 3), 'p95_ms': round(p95, 3), 'runs': repeat}
+    print(f"  {name:<24}{median:>12.2f}{p95:>12.2f}")
+
+
+def import_file(db, path, name):
+    lib_id = db.add_library(name)
+    db.bulk_add_words(iter_word_pairs(iter_rows(path)), lib_id)
+
+
+def import_pack(db, path, name):
+    lib_id = db.add_library(name)
+    with WordPack(path) as pack: db.bulk_add_words(pack, lib_id)
+
+
+def run_size(db, tmp, repeat, import_rows):
+    results = {}
+    rng = random.Random(4)
+    counter = iter(range(10 ** 9))
+    lib_ids = [r[0] for r in db.get_libraries()]
+    print(f"  {'项目':<24}{'中位数 ms':>12}{'P95 ms':>12}")
+    # 只读查询
+    record(results, 'get_words_due', lambda: db.get_words(mode='due', limit=20), repeat)
+    record(results, 'get_words_random', lambda: db.get_words(mode='random', filter_status=[0, 1], limit=20), repeat)
+    record(results, 'get_stats', db.get_stats, repeat)
+    record(results, 'get_total_count', db.get_total_count, repeat)
+    record(results, 'get_libraries', db.get_libraries, repeat)
+    record(results, 'get_words_page', lambda: db.get_words_page(2, limit=50), repeat)
+    record(results, 'search_prefix', lambda: db.search_words('ab'), repeat)
+    record(results, 'search_chinese', lambda: db.search_words('一'), repeat)
+    # 写入
+    record(results, 'add_word', lambda: db.add_word(f"bench{next(counter)}", '基准', lib_ids[-1]), repeat)
+    def status_burst():
+        for _ in range(200): db.update_status(rng.randint(1, 1000), rng.choice((1, 2)))
+        db.flush()
+    record(results, 'update_status_burst_200', status_burst, repeat)
+    def grade_batch():
+        for w in db.get_words(mode='due', limit=20): db.grade_word(w['id'], rng.choice((2, 5)))
+        db.flush()
+    record(results, 'grade_batch_20', grade_batch, repeat)
+    # 同步：导出上次导出以来改动过的单词（走 seq 索引），再按另一台设备的身份合并回来（逐条按唯一索引对应）
+    def sync_export():
+        for _ in range(200): db.update_status(rng.randint(1, 1000), rng.choice((1, 2)))
+        changes = db.get_changes()
+        db.mark_exported(changes['upto'])
+        return changes
+    record(results, 'sync_export_200', sync_export, repeat)
+    incoming = dict(sync_export(), device=-1)
+    record(results, 'sync_merge_200', lambda: db.merge_changes(incoming), repeat)
+    # 学习者：新学习者第一次切换要给每个单词建进度行，之后来回切换只换 attach 的进度库
+    other = db.add_profile('bench')
+    record(results, 'switch_profile_first', lambda: db.switch_profile(other), 1)
+    record(results, 'switch_profile_pair', lambda: (db.switch_profile(1), db.switch_profile(other)), repeat)
+    db.switch_profile(1)
+    # 导入（每次导入成一个新词库）
+    csv_path = os.path.join(tmp, 'bench.csv')
+    write_csv(csv_path, import_rows)
+    record(results, f'import_csv_{import_rows}', lambda: import_file(db, csv_path, f"csv{next(counter)}"), 3)
+    xlsx_path = os.path.join(tmp, 'bench.xlsx')
+    if write_xlsx(xlsx_path, import_rows):
+        record(results, f'import_xlsx_{import_rows}', lambda: import_file(db, xlsx_path, f"xlsx{next(counter)}"), 3)
+    wpk_path = os.path.join(tmp, 'bench.wpk')
+    write_wpk(wpk_path, import_rows)
+    record(results, f'import_wpk_{import_rows}', lambda: import_pack(db, wpk_path, f"wpk{next(counter)}"), 3)
+    # 重置与删除：先计 O(1) 的部分，再计后台清理的总耗时
+    record(results, 'reset_progress', db.reset_progress, repeat)
+    record(results, 'clean_stale_all', lambda: drain(db.clean_stale_progress), 1)
+    record(results, 'delete_library', lambda: db.delete_library(lib_ids[0]), 1)
+    record(results, 'purge_library_all', lambda: drain(db.purge_deleted_libraries), 1)
+    return results
+
+
+def drain(step):
+    while step(): pass
+
+
+# --- suite ---
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def prepare_db(size, libraries, work, cache):
+    # 有缓存目录时复用同一结构版本下生成过的原始库（内容库和进度库两个文件），每次运行都在副本上测
+    path = os.path.join(work, f"bench-{size}.db")
+    if cache:
+        os.makedirs(cache, exist_ok=True)
+        pristine = os.path.join(cache, f"bench-{size}-v{len(database.MIGRATIONS)}-p{len(database.PROGRESS_MIGRATIONS)}.db")
+        if not os.path.exists(pristine):
+            build_db(pristine, size, libraries=libraries).conn.close()
+        shutil.copyfile(pristine, path)
+        shutil.copyfile(database.progress_path(pristine), database.progress_path(path))
+        return DatabaseManager(path), 0.0
+    start = time.perf_counter()
+    db = build_db(path, size, libraries=libraries)
+    return db, time.perf_counter() - start
+
+
+def run_suite(args):
+    sizes = [int(s) for s in args.sizes.split(',')]
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'schema_version': len(database.MIGRATIONS),
+            'progress_schema_version': len(database.PROGRESS_MIGRATIONS),
+            'repeat': args.repeat,
+        },
+        'sizes': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            libraries = max(10, size // 20000)
+            print(f"生成 {size} 词 / {libraries} 个词库的测试库...")
+            db, build_s = prepare_db(size, libraries, tmp, args.cache)
+            results = run_size(db, tmp, args.repeat, args.import_rows)
+            db.conn.close()
+            report['sizes'][str(size)] = {'libraries': libraries, 'build_s': round(build_s, 2), 'results': results}
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.out}")
+    if args.compare: compare(args.compare, report)
+
+
+def compare(old_path, new):
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    print(f"对比 {old['meta'].get('commit')} -> {new['meta'].get('commit')}（中位数 ms）")
+    for size, entry in new['sizes'].items():
+        before = old['sizes'].get(size, {}).get('results', {})
+        print(f"[{size}]")
+        for name, r in entry['results'].items():
+            if name not in before: continue
+            ratio = r['median_ms'] / before[name]['median_ms'] if before[name]['median_ms'] else float('inf')
+            slower = ratio > REGRESSION_RATIO and r['median_ms'] - before[name]['median_ms'] > REGRESSION_MIN_MS
+            flag = '  <-- 变慢' if slower else ''
+            print(f"  {name:<24}{before[name]['median_ms']:>12.2f}{r['median_ms']:>12.2f}{ratio:>8.2f}x{flag}")
+
+
+# --- random：拒绝采样与 ORDER BY RANDOM() 对比 ---
+
+def run_random(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"生成 {args.words} 词的测试库...")
+        db = build_db(os.path.join(tmp, 'bench.db'), args.words)
+        legacy = timed(lambda: db.cursor.execute(LEGACY_RANDOM_QUERY, (args.batch,)).fetchall(), args.repeat)
+        sampler = timed(lambda: db.get_words(mode='random', filter_status=[0, 1], limit=args.batch), args.repeat)
+        print(f"{'方法':<16}{'中位数 ms':>12}{'P95 ms':>12}")
+        print(f"{'ORDER BY RANDOM':<16}{legacy[0]:>12.2f}{legacy[1]:>12.2f}")
+        print(f"{'拒绝采样':<16}{sampler[0]:>12.2f}{sampler[1]:>12.2f}")
+        db.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    suite = sub.add_parser('suite')
+    suite.add_argument('--sizes', default='10000,100000,1000000')
+    suite.add_argument('--repeat', type=int, default=20)
+    suite.add_argument('--import-rows', type=int, default=10000)
+    suite.add_argument('--out', default='bench.json')
+    suite.add_argument('--compare')
+    suite.add_argument('--cache')
+    rand = sub.add_parser('random')
+    rand.add_argument('--words', type=int, default=300000)
+    rand.add_argument('--batch', type=int, default=20)
+    rand.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    if args.command == 'suite': run_suite(args)
+    else: run_random(args)
+
+
+if __name__ == '__main__':
+    main()
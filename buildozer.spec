@@ -10,7 +10,7 @@ package.domain = org.mieda
 source.dir = .
 
 # 源代码包含的文件后缀 (这里包含了 ttf)
-source.include_exts = py,png,jpg,kv,atlas,ttf,db,xlsx,xls,csv
+source.include_exts = py,png,jpg,kv,atlas,ttf,db,xlsx,xls,csv,wpk
 
 # 版本号
 version = 0.1
@@ -0,0 +1,953 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+
+import scheduler
+
+# --- 数据库结构迁移 ---
+# 结构升级按顺序登记在 MIGRATIONS 中，PRAGMA user_version 记录已执行到第几个；
+# 新增结构变更只能在末尾追加迁移，不要改动已发布的迁移
+
+def migrate_v1(cur):
+    # 基础表；旧版安装没有 user_version，可能缺 library_id 列
+    cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('tutorial_seen', '0')")
+    cur.execute("CREATE TABLE IF NOT EXISTS libraries (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, is_active INTEGER DEFAULT 1)")
+    cur.execute("CREATE TABLE IF NOT EXISTS words (id INTEGER PRIMARY KEY AUTOINCREMENT, english TEXT, chinese TEXT, status INTEGER DEFAULT 0, library_id INTEGER DEFAULT 1)")
+    columns = [i[1] for i in cur.execute("PRAGMA table_info(words)")]
+    if 'library_id' not in columns:
+        cur.execute("ALTER TABLE words ADD COLUMN library_id INTEGER DEFAULT 1")
+        cur.execute("INSERT OR IGNORE INTO libraries (id, name, is_active) VALUES (1, '默认词库', 1)")
+
+def migrate_v2(cur):
+    # 重建 words：加外键，丢弃孤儿行，同一词库内重复的英文只保留最早一条；
+    # 然后建 (library_id, english) 唯一索引与 (library_id, status) 覆盖索引
+    cur.execute("CREATE TABLE words_new (id INTEGER PRIMARY KEY AUTOINCREMENT, english TEXT, chinese TEXT, status INTEGER DEFAULT 0, "
+                "library_id INTEGER DEFAULT 1 REFERENCES libraries (id))")
+    cur.execute("INSERT INTO words_new (id, english, chinese, status, library_id) "
+                "SELECT id, english, chinese, status, library_id FROM words "
+                "WHERE library_id IN (SELECT id FROM libraries) "
+                "AND id IN (SELECT MIN(id) FROM words GROUP BY library_id, english)")
+    cur.execute("DROP TABLE words")
+    cur.execute("ALTER TABLE words_new RENAME TO words")
+    cur.execute("CREATE UNIQUE INDEX idx_words_library_english ON words (library_id, english)")
+    cur.execute("CREATE INDEX idx_words_library_status ON words (library_id, status)")
+
+def migrate_v3(cur):
+    # SM-2 调度字段：due_at 为空表示从未学过的新词；
+    # 旧的“待复习”立即到期，旧的“已掌握”按 21 天间隔分散到未来 7~27 天
+    cur.execute("ALTER TABLE words ADD COLUMN interval_days INTEGER DEFAULT 0")
+    cur.execute(f"ALTER TABLE words ADD COLUMN ease REAL DEFAULT {scheduler.DEFAULT_EASE}")
+    cur.execute("ALTER TABLE words ADD COLUMN reps INTEGER DEFAULT 0")
+    cur.execute("ALTER TABLE words ADD COLUMN due_at INTEGER")
+    cur.execute("UPDATE words SET due_at = 0, interval_days = 1 WHERE status = 1")
+    cur.execute(f"UPDATE words SET due_at = CAST(strftime('%s', 'now') AS INTEGER) + {scheduler.DAY} * (7 + ABS(RANDOM() % 21)), "
+                "interval_days = 21, reps = 3 WHERE status = 2")
+    cur.execute("CREATE INDEX idx_words_due ON words (due_at)")
+
+def rebuild_word_counts(cur):
+    # v4 建计数表时用：按 (词库, 状态) 重新统计
+    cur.execute("DELETE FROM word_counts")
+    cur.execute("INSERT INTO word_counts (library_id, status, is_active, n) "
+                "SELECT w.library_id, w.status, l.is_active, COUNT(*) FROM words w JOIN libraries l ON w.library_id = l.id "
+                "GROUP BY w.library_id, w.status")
+
+def migrate_v4(cur):
+    # 按 (词库, 状态) 计数的统计表，由触发器随 words / libraries 的增删改同步维护，
+    # 首页统计只需读 O(词库数) 行；is_active 冗余一份，免得读统计时再连表
+    cur.execute("CREATE TABLE word_counts (library_id INTEGER, status INTEGER, is_active INTEGER, n INTEGER DEFAULT 0, "
+                "PRIMARY KEY (library_id, status))")
+    cur.execute("""CREATE TRIGGER trg_words_count_insert AFTER INSERT ON words BEGIN
+        INSERT OR IGNORE INTO word_counts (library_id, status, is_active, n)
+            VALUES (NEW.library_id, NEW.status, (SELECT is_active FROM libraries WHERE id = NEW.library_id), 0);
+        UPDATE word_counts SET n = n + 1 WHERE library_id = NEW.library_id AND status = NEW.status;
+    END""")
+    cur.execute("""CREATE TRIGGER trg_words_count_delete AFTER DELETE ON words BEGIN
+        UPDATE word_counts SET n = n - 1 WHERE library_id = OLD.library_id AND status = OLD.status;
+    END""")
+    cur.execute("""CREATE TRIGGER trg_words_count_update AFTER UPDATE OF status, library_id ON words
+        WHEN OLD.status IS NOT NEW.status OR OLD.library_id IS NOT NEW.library_id BEGIN
+        UPDATE word_counts SET n = n - 1 WHERE library_id = OLD.library_id AND status = OLD.status;
+        INSERT OR IGNORE INTO word_counts (library_id, status, is_active, n)
+            VALUES (NEW.library_id, NEW.status, (SELECT is_active FROM libraries WHERE id = NEW.library_id), 0);
+        UPDATE word_counts SET n = n + 1 WHERE library_id = NEW.library_id AND status = NEW.status;
+    END""")
+    cur.execute("""CREATE TRIGGER trg_libraries_count_active AFTER UPDATE OF is_active ON libraries BEGIN
+        UPDATE word_counts SET is_active = NEW.is_active WHERE library_id = NEW.id;
+    END""")
+    cur.execute("""CREATE TRIGGER trg_libraries_count_delete AFTER DELETE ON libraries BEGIN
+        DELETE FROM word_counts WHERE library_id = OLD.id;
+    END""")
+    rebuild_word_counts(cur)
+
+def migrate_v5(cur):
+    # 列表页按状态分页：(status, rowid) 索引让 “status = ? AND id < ? ORDER BY id DESC” 成为范围扫描
+    cur.execute("CREATE INDEX idx_words_status ON words (status)")
+
+# 进度代数：单词的 gen 落后于所属词库的 progress_gen 时，它的进度已被重置，一律视为新词。
+# 重置只需把词库的 progress_gen 加一；过期行由 clean_stale_progress 在后台分块清理
+
+def row_effective_status(row):
+    # v6 计数触发器里的有效状态，row 为 NEW 或 OLD
+    return f"CASE WHEN {row}.gen < (SELECT progress_gen FROM libraries WHERE id = {row}.library_id) THEN 0 ELSE {row}.status END"
+
+def create_word_count_triggers(cur):
+    # words 上按有效状态维护 word_counts 的触发器（v6 起的版本）
+    cur.execute(f"""CREATE TRIGGER trg_words_count_insert AFTER INSERT ON words BEGIN
+        INSERT OR IGNORE INTO word_counts (library_id, status, is_active, n)
+            VALUES (NEW.library_id, {row_effective_status('NEW')}, (SELECT is_active FROM libraries WHERE id = NEW.library_id), 0);
+        UPDATE word_counts SET n = n + 1 WHERE library_id = NEW.library_id AND status = {row_effective_status('NEW')};
+    END""")
+    cur.execute(f"""CREATE TRIGGER trg_words_count_delete AFTER DELETE ON words BEGIN
+        UPDATE word_counts SET n = n - 1 WHERE library_id = OLD.library_id AND status = {row_effective_status('OLD')};
+    END""")
+    cur.execute(f"""CREATE TRIGGER trg_words_count_update AFTER UPDATE OF status, library_id, gen ON words
+        WHEN OLD.status IS NOT NEW.status OR OLD.library_id IS NOT NEW.library_id OR OLD.gen IS NOT NEW.gen BEGIN
+        UPDATE word_counts SET n = n - 1 WHERE library_id = OLD.library_id AND status = {row_effective_status('OLD')};
+        INSERT OR IGNORE INTO word_counts (library_id, status, is_active, n)
+            VALUES (NEW.library_id, {row_effective_status('NEW')}, (SELECT is_active FROM libraries WHERE id = NEW.library_id), 0);
+        UPDATE word_counts SET n = n + 1 WHERE library_id = NEW.library_id AND status = {row_effective_status('NEW')};
+    END""")
+
+def migrate_v6(cur):
+    # 加进度代数；计数触发器改为按有效状态计数，词库代数增加时把该词库的计数整体并入“新词”
+    cur.execute("ALTER TABLE libraries ADD COLUMN progress_gen INTEGER DEFAULT 0")
+    cur.execute("ALTER TABLE words ADD COLUMN gen INTEGER DEFAULT 0")
+    cur.execute("CREATE INDEX idx_words_library_gen ON words (library_id, gen)")
+    for name in ('trg_words_count_insert', 'trg_words_count_delete', 'trg_words_count_update'):
+        cur.execute(f"DROP TRIGGER {name}")
+    create_word_count_triggers(cur)
+    cur.execute("""CREATE TRIGGER trg_libraries_count_gen AFTER UPDATE OF progress_gen ON libraries
+        WHEN NEW.progress_gen > OLD.progress_gen BEGIN
+        INSERT OR IGNORE INTO word_counts (library_id, status, is_active, n) VALUES (NEW.id, 0, NEW.is_active, 0);
+        UPDATE word_counts SET n = (SELECT SUM(n) FROM word_counts WHERE library_id = NEW.id) WHERE library_id = NEW.id AND status = 0;
+        UPDATE word_counts SET n = 0 WHERE library_id = NEW.id AND status != 0;
+    END""")
+
+WORD_COLUMNS = "id, english, chinese, status, library_id, interval_days, ease, reps, due_at, gen"
+
+def migrate_v7(cur):
+    # 删除词库改为先打墓碑（deleted = 1，同时停用），单词由 purge_deleted_libraries 在后台分块删除；
+    # 重建 words 让外键带上 ON DELETE CASCADE，随后重建索引和计数触发器
+    cur.execute("ALTER TABLE libraries ADD COLUMN deleted INTEGER DEFAULT 0")
+    cur.execute("CREATE TABLE words_new (id INTEGER PRIMARY KEY AUTOINCREMENT, english TEXT, chinese TEXT, status INTEGER DEFAULT 0, "
+                "library_id INTEGER DEFAULT 1 REFERENCES libraries (id) ON DELETE CASCADE, "
+                f"interval_days INTEGER DEFAULT 0, ease REAL DEFAULT {scheduler.DEFAULT_EASE}, reps INTEGER DEFAULT 0, "
+                "due_at INTEGER, gen INTEGER DEFAULT 0)")
+    cur.execute(f"INSERT INTO words_new ({WORD_COLUMNS}) SELECT {WORD_COLUMNS} FROM words")
+    cur.execute("DROP TABLE words")
+    cur.execute("ALTER TABLE words_new RENAME TO words")
+    cur.execute("CREATE UNIQUE INDEX idx_words_library_english ON words (library_id, english)")
+    cur.execute("CREATE INDEX idx_words_library_status ON words (library_id, status)")
+    cur.execute("CREATE INDEX idx_words_due ON words (due_at)")
+    cur.execute("CREATE INDEX idx_words_status ON words (status)")
+    cur.execute("CREATE INDEX idx_words_library_gen ON words (library_id, gen)")
+    create_word_count_triggers(cur)
+
+# 搜索索引里中文按单字切开：FTS5 的默认分词器会把一串汉字当成一个词，拆开后按短语查询即子串匹配
+CJK_CHAR_RE = re.compile(r'([\u3400-\u9fff\uf900-\ufaff])')
+
+def split_cjk(text):
+    return CJK_CHAR_RE.sub(r' \1 ', text or '')
+
+def migrate_v8(cur):
+    # 无内容 FTS5 索引：english 一列，chinese 按单字切开后一列，rowid 即 words.id；
+    # 触发器里的 split_cjk 由 DatabaseManager 在每个连接上注册，直接用 sqlite3 命令行改 words 会报错。
+    # prefix 索引让边输入边搜的短前缀查询不用合并大量词项。SQLite 没有编译 FTS5 时跳过，搜索退回 LIKE
+    try:
+        cur.execute("CREATE VIRTUAL TABLE words_fts USING fts5(english, chinese, content='', prefix='1 2 3')")
+    except sqlite3.OperationalError:
+        return
+    cur.execute("INSERT INTO words_fts (rowid, english, chinese) SELECT id, english, split_cjk(chinese) FROM words")
+    create_fts_triggers(cur)
+
+def create_fts_triggers(cur):
+    cur.execute("""CREATE TRIGGER trg_words_fts_insert AFTER INSERT ON words BEGIN
+        INSERT INTO words_fts (rowid, english, chinese) VALUES (NEW.id, NEW.english, split_cjk(NEW.chinese));
+    END""")
+    cur.execute("""CREATE TRIGGER trg_words_fts_delete AFTER DELETE ON words BEGIN
+        INSERT INTO words_fts (words_fts, rowid, english, chinese) VALUES ('delete', OLD.id, OLD.english, split_cjk(OLD.chinese));
+    END""")
+    cur.execute("""CREATE TRIGGER trg_words_fts_update AFTER UPDATE OF english, chinese ON words BEGIN
+        INSERT INTO words_fts (words_fts, rowid, english, chinese) VALUES ('delete', OLD.id, OLD.english, split_cjk(OLD.chinese));
+        INSERT INTO words_fts (rowid, english, chinese) VALUES (NEW.id, NEW.english, split_cjk(NEW.chinese));
+    END""")
+
+def migrate_v9(cur):
+    # 导入文件里英文、中文以外的列（音标、例句、备注…），JSON 对象 {列名: 值}；没有时为 NULL
+    cur.execute("ALTER TABLE words ADD COLUMN extra TEXT")
+
+CONTENT_COLUMNS = "id, english, chinese, library_id, extra"
+PROGRESS_COLUMNS = "status, interval_days, ease, reps, due_at, gen"
+
+def migrate_v10(cur):
+    # 进度拆到单独的进度库（attach 为 progress，表由 PROGRESS_MIGRATIONS 先建好）：搬走各词库的代数和每个单词的进度，
+    # 计数由进度库的触发器随插入重建；然后删掉旧的计数表、触发器，重建 words 只留内容列。
+    # libraries.progress_gen 不再使用
+    cur.execute("DELETE FROM progress.word_progress")
+    cur.execute("DELETE FROM progress.word_counts")
+    cur.execute("INSERT OR REPLACE INTO progress.library_progress (library_id, progress_gen) SELECT id, progress_gen FROM libraries")
+    cur.execute(f"INSERT INTO progress.word_progress (word_id, library_id, {PROGRESS_COLUMNS}) SELECT id, library_id, {PROGRESS_COLUMNS} FROM words")
+    for name in ('trg_libraries_count_active', 'trg_libraries_count_delete', 'trg_libraries_count_gen'):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cur.execute("DROP TABLE word_counts")
+    cur.execute("CREATE TABLE words_new (id INTEGER PRIMARY KEY AUTOINCREMENT, english TEXT, chinese TEXT, "
+                "library_id INTEGER DEFAULT 1 REFERENCES libraries (id) ON DELETE CASCADE, extra TEXT)")
+    cur.execute(f"INSERT INTO words_new ({CONTENT_COLUMNS}) SELECT {CONTENT_COLUMNS} FROM words")
+    cur.execute("DROP TABLE words")
+    cur.execute("ALTER TABLE words_new RENAME TO words")
+    cur.execute("CREATE UNIQUE INDEX idx_words_library_english ON words (library_id, english)")
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'words_fts'").fetchone(): create_fts_triggers(cur)
+
+# 留在内容库、不随学习者切换的设置（调试用和本机的同步标识）；其余设置属于各学习者，存在进度库里
+DEVICE_SETTINGS = ('profiling', 'slow_query_ms', 'device_id')
+
+def migrate_v11(cur):
+    # 多个学习者共用内容库：学习者登记在 profiles，每人一个进度库文件（见 profile_path），last_used 最大的是当前学习者。
+    # 原有的进度、词库启用状态和设置归入默认学习者（id 1，沿用原来的进度库）。libraries.is_active 不再使用
+    cur.execute("CREATE TABLE profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, last_used INTEGER DEFAULT 0)")
+    cur.execute("INSERT INTO profiles (id, name, last_used) VALUES (1, '默认', 1)")
+    cur.execute("UPDATE progress.library_progress SET is_active = COALESCE((SELECT is_active FROM libraries WHERE id = library_id), 1)")
+    device = ','.join(f"'{key}'" for key in DEVICE_SETTINGS)
+    cur.execute(f"REPLACE INTO progress.settings (key, value) SELECT key, value FROM settings WHERE key NOT IN ({device})")
+    cur.execute(f"DELETE FROM settings WHERE key NOT IN ({device})")
+
+def migrate_v12(cur):
+    # 进度库的迁移先于内容库执行，升级旧版本时 progress_v3 标记已学单词那一步面对的还是空表，
+    # 进度由 v10 随后搬进来，seq 都是 0，同步时不会被导出。这里补记为设备 0 在时钟 1 的改动；
+    # 本机改动和合并进来的行都有 seq，仍为 0 的只可能是迁移搬进来的
+    cur.execute("UPDATE progress.word_progress SET seq = 1, clock = 1 "
+                "WHERE seq = 0 AND (status != 0 OR reps != 0 OR due_at IS NOT NULL)")
+
+MIGRATIONS = [migrate_v1, migrate_v2, migrate_v3, migrate_v4, migrate_v5, migrate_v6, migrate_v7, migrate_v8, migrate_v9, migrate_v10,
+              migrate_v11, migrate_v12]
+
+# --- 进度库结构迁移 ---
+# 进度库是单独的文件，attach 为 progress，版本记在它自己的 user_version 里。
+# 只放会随学习频繁改动的窄行：每个单词一行进度（word_id 即 words.id）、各词库的代数和按状态的计数，
+# 滑动只改这些几十字节的行，不再弄脏存放英文、释义的大页面；内容库只在导入和删除时改动
+
+def progress_effective_status(row):
+    # 进度库触发器里的有效状态，row 为 NEW 或 OLD；触发器只能引用同一个库里的表
+    return f"CASE WHEN {row}.gen < (SELECT progress_gen FROM library_progress WHERE library_id = {row}.library_id) THEN 0 ELSE {row}.status END"
+
+def progress_v1(cur):
+    cur.execute("CREATE TABLE progress.word_progress (word_id INTEGER PRIMARY KEY, library_id INTEGER, status INTEGER DEFAULT 0, "
+                f"interval_days INTEGER DEFAULT 0, ease REAL DEFAULT {scheduler.DEFAULT_EASE}, reps INTEGER DEFAULT 0, "
+                "due_at INTEGER, gen INTEGER DEFAULT 0)")
+    cur.execute("CREATE INDEX progress.idx_progress_status ON word_progress (status)")
+    cur.execute("CREATE INDEX progress.idx_progress_due ON word_progress (due_at)")
+    cur.execute("CREATE INDEX progress.idx_progress_library_gen ON word_progress (library_id, gen)")
+    cur.execute("CREATE TABLE progress.library_progress (library_id INTEGER PRIMARY KEY, progress_gen INTEGER DEFAULT 0)")
+    cur.execute("CREATE TABLE progress.word_counts (library_id INTEGER, status INTEGER, n INTEGER DEFAULT 0, PRIMARY KEY (library_id, status))")
+    cur.execute(f"""CREATE TRIGGER progress.trg_progress_count_insert AFTER INSERT ON word_progress BEGIN
+        INSERT OR IGNORE INTO word_counts (library_id, status, n) VALUES (NEW.library_id, {progress_effective_status('NEW')}, 0);
+        UPDATE word_counts SET n = n + 1 WHERE library_id = NEW.library_id AND status = {progress_effective_status('NEW')};
+    END""")
+    cur.execute(f"""CREATE TRIGGER progress.trg_progress_count_delete AFTER DELETE ON word_progress BEGIN
+        UPDATE word_counts SET n = n - 1 WHERE library_id = OLD.library_id AND status = {progress_effective_status('OLD')};
+    END""")
+    cur.execute(f"""CREATE TRIGGER progress.trg_progress_count_update AFTER UPDATE OF status, gen ON word_progress
+        WHEN OLD.status IS NOT NEW.status OR OLD.gen IS NOT NEW.gen BEGIN
+        UPDATE word_counts SET n = n - 1 WHERE library_id = OLD.library_id AND status = {progress_effective_status('OLD')};
+        INSERT OR IGNORE INTO word_counts (library_id, status, n) VALUES (NEW.library_id, {progress_effective_status('NEW')}, 0);
+        UPDATE word_counts SET n = n + 1 WHERE library_id = NEW.library_id AND status = {progress_effective_status('NEW')};
+    END""")
+    cur.execute("""CREATE TRIGGER progress.trg_library_progress_gen AFTER UPDATE OF progress_gen ON library_progress
+        WHEN NEW.progress_gen > OLD.progress_gen BEGIN
+        INSERT OR IGNORE INTO word_counts (library_id, status, n) VALUES (NEW.library_id, 0, 0);
+        UPDATE word_counts SET n = (SELECT SUM(n) FROM word_counts WHERE library_id = NEW.library_id) WHERE library_id = NEW.library_id AND status = 0;
+        UPDATE word_counts SET n = 0 WHERE library_id = NEW.library_id AND status != 0;
+    END""")
+    cur.execute("""CREATE TRIGGER progress.trg_library_progress_delete AFTER DELETE ON library_progress BEGIN
+        DELETE FROM word_counts WHERE library_id = OLD.library_id;
+    END""")
+
+def progress_v2(cur):
+    # 进度库改为按学习者一个：各自的词库启用状态和设置也搬进来（内容库 v11 迁入原有的值）
+    cur.execute("ALTER TABLE progress.library_progress ADD COLUMN is_active INTEGER DEFAULT 1")
+    cur.execute("CREATE TABLE progress.settings (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute("INSERT INTO progress.settings (key, value) VALUES ('tutorial_seen', '0')")
+
+def progress_v3(cur):
+    # 设备间同步：每行记下最后一次改动的逻辑时钟（Lamport）和来源设备，按 (clock, device) 后写者胜；
+    # seq 是本机的改动序号，导出“上次同步以来的改动”按 seq 索引范围扫描，代价只与改动数有关。
+    # 词库重置也是一次改动，记在 library_progress。已经学过的单词记为设备 0 在时钟 1 的改动，第一次同步时一并带上
+    for col in ('seq', 'clock', 'device'):
+        cur.execute(f"ALTER TABLE progress.word_progress ADD COLUMN {col} INTEGER DEFAULT 0")
+        cur.execute(f"ALTER TABLE progress.library_progress ADD COLUMN reset_{col} INTEGER DEFAULT 0")
+    cur.execute("UPDATE progress.word_progress SET seq = 1, clock = 1 WHERE status != 0 OR reps != 0 OR due_at IS NOT NULL")
+    cur.execute("CREATE INDEX progress.idx_progress_seq ON word_progress (seq)")
+    # 本机的逻辑时钟、改动序号和上次导出到的序号，只有一行
+    cur.execute("CREATE TABLE progress.sync_state (id INTEGER PRIMARY KEY CHECK (id = 1), clock INTEGER, seq INTEGER, exported_seq INTEGER)")
+    cur.execute("INSERT INTO progress.sync_state (id, clock, seq, exported_seq) VALUES (1, 1, 1, 0)")
+    # 从每台设备收到的最大改动序号，用来发现漏导入的同步文件
+    cur.execute("CREATE TABLE progress.sync_peers (device INTEGER PRIMARY KEY, received_seq INTEGER)")
+
+PROGRESS_MIGRATIONS = [progress_v1, progress_v2, progress_v3]
+
+def create_link_triggers(cur):
+    # 内容库和进度库之间的联动只能用 TEMP 触发器（普通触发器不能引用别的库），每个连接打开时都要建一次：
+    # 新增单词 / 词库时补上进度行（进度按所属词库的当前代数），删除时连带删掉。
+    # 触发器里增删改的目标表不能带库名，进度库的表名在内容库里没有同名的，按名字就能找到
+    cur.execute("""CREATE TEMP TRIGGER IF NOT EXISTS trg_link_word_insert AFTER INSERT ON main.words BEGIN
+        INSERT OR IGNORE INTO word_progress (word_id, library_id, gen)
+            VALUES (NEW.id, NEW.library_id, COALESCE((SELECT progress_gen FROM progress.library_progress WHERE library_id = NEW.library_id), 0));
+    END""")
+    cur.execute("""CREATE TEMP TRIGGER IF NOT EXISTS trg_link_word_delete AFTER DELETE ON main.words BEGIN
+        DELETE FROM word_progress WHERE word_id = OLD.id;
+    END""")
+    cur.execute("""CREATE TEMP TRIGGER IF NOT EXISTS trg_link_library_insert AFTER INSERT ON main.libraries BEGIN
+        INSERT OR IGNORE INTO library_progress (library_id) VALUES (NEW.id);
+    END""")
+    cur.execute("""CREATE TEMP TRIGGER IF NOT EXISTS trg_link_library_delete AFTER DELETE ON main.libraries BEGIN
+        DELETE FROM library_progress WHERE library_id = OLD.id;
+    END""")
+
+def progress_path(db_name):
+    # vocab.db 的进度库为 vocab_progress.db；内存库配内存进度库
+    if db_name == ':memory:': return db_name
+    root, ext = os.path.splitext(db_name)
+    return f"{root}_progress{ext or '.db'}"
+
+def profile_path(db_name, profile_id):
+    # 默认学习者（id 1）沿用 vocab_progress.db，其余为 vocab_progress_2.db、vocab_progress_3.db…
+    path = progress_path(db_name)
+    if profile_id == 1 or path == ':memory:': return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{profile_id}{ext}"
+
+def settings_table(key):
+    return 'main.settings' if key in DEVICE_SETTINGS else 'progress.settings'
+
+# --- 数据库管理 ---
+# 单词内容 + 进度 + 词库的连表，以及按代数判断的有效状态
+WORD_JOIN = ("FROM words w JOIN progress.word_progress p ON p.word_id = w.id "
+             "JOIN progress.library_progress g ON g.library_id = w.library_id JOIN libraries l ON l.id = w.library_id")
+EFFECTIVE_STATUS = "CASE WHEN p.gen < g.progress_gen THEN 0 ELSE p.status END"
+# 当前学习者启用、且没有删除的词库（g 为 library_progress，l 为 libraries）
+ACTIVE_LIBRARY = "g.is_active = 1 AND l.deleted = 0"
+# 启用词库的计数行
+ACTIVE_COUNTS = ("FROM progress.word_counts c JOIN progress.library_progress g ON g.library_id = c.library_id "
+                 f"JOIN libraries l ON l.id = c.library_id WHERE {ACTIVE_LIBRARY}")
+# 随机抽词每轮最多回表检查的候选 id 数（同时受 SQLite 参数个数上限约束）
+SAMPLE_ROUND_MAX = 500
+# 把单词恢复成从未学过的新词
+RESET_SCHEDULE = f"status = 0, interval_days = 0, ease = {scheduler.DEFAULT_EASE}, reps = 0, due_at = NULL"
+NEW_PROGRESS = (0, 0, scheduler.DEFAULT_EASE, 0, None)
+# 写入进度时把单词的 gen 对齐到所属词库的当前代数
+CURRENT_GEN = "gen = (SELECT progress_gen FROM progress.library_progress WHERE library_id = word_progress.library_id)"
+# 写入进度 / 重置词库时记下的同步信息，参数为 next_change() 的 (seq, clock) 加设备 id
+STAMP = "seq = ?, clock = ?, device = ?"
+RESET_STAMP = "reset_seq = ?, reset_clock = ?, reset_device = ?"
+# 每次后台清理最多处理的过期行数 / 后台删除已删词库时每块删除的单词数
+STALE_CHUNK = 2000
+PURGE_CHUNK = 2000
+# 补进度行时每个事务最多补的单词数，新学习者第一次切换时整个词表分块补齐，别的连接能在块之间写入
+BACKFILL_CHUNK = 5000
+# 每次增量回收最多归还的空闲页数（内容库默认页大小 4 KB）
+VACUUM_PAGES = 256
+# 进度库的页大小：行都很窄，小页让每次滑动写出的字节更少（只对新建的进度库生效）
+PROGRESS_PAGE_SIZE = 1024
+# 导出时每次 fetchmany 取多少行
+EXPORT_CHUNK = 1000
+# 导入每提交一块后让出写锁的时间（秒）：SQLite 的忙等是轮询，不停顿的话其他连接很难抢到两块之间的空隙
+IMPORT_YIELD = 0.005
+# 搜索词里可用作 FTS 词项的部分（字母、数字、汉字），其余字符一律当分隔符
+SEARCH_TOKEN_RE = re.compile(r'[0-9A-Za-z\u00c0-\u024f]+|[\u3400-\u9fff\uf900-\ufaff]')
+
+def progress_order(values):
+    # 同步时两条改动的时钟和设备都相同时，按进度值 (status, interval_days, ease, reps, due_at) 比较出确定的先后
+    return tuple(-1 if v is None else v for v in values)
+
+def fts_query(text):
+    # 含汉字时在 chinese 列按单字短语查（子串匹配），否则在 english 列按前缀查；无可用词项时返回 None
+    tokens = SEARCH_TOKEN_RE.findall(text)
+    if not tokens: return None
+    if any(CJK_CHAR_RE.match(t) for t in tokens):
+        return 'chinese : "' + ' '.join(tokens) + '"'
+    return 'english : (' + ' '.join(f'"{t}"*' for t in tokens) + ')'
+
+class DatabaseManager:
+    def __init__(self, db_name='vocab.db', progress_name=None):
+        # progress_name 为进度库文件，默认打开当前学习者的进度库（见 profile_path）；
+        # 后台任务直接传入主连接正在用的文件，此时 profile_id 为 None
+        self.db_name = db_name
+        self.conn = sqlite3.connect(db_name)
+        self.cursor = self.conn.cursor()
+        self.conn.create_function('split_cjk', 1, split_cjk, deterministic=True)
+        # 只对还没有写过文件头的新库生效，必须在切换 WAL 之前；旧库由 reclaim_space 第一次调用时 VACUUM 转换
+        self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL 下提交只追加日志，NORMAL 级别不在每次提交时 fsync；断电最多丢失最近几次提交
+        self.cursor.execute("PRAGMA journal_mode = WAL")
+        self.cursor.execute("PRAGMA synchronous = NORMAL")
+        self.profile_id = None if progress_name else self.current_profile()
+        self.attach_progress(progress_name or profile_path(db_name, self.profile_id))
+        # 滑动产生的进度改动先缓存在内存，由 flush() 一次事务写入：{word_id: {列名: 值}}
+        self.pending = {}
+        self.init_db()
+
+    def attach_progress(self, path):
+        self.progress_name = path
+        self.cursor.execute("ATTACH DATABASE ? AS progress", (path,))
+        self.cursor.execute(f"PRAGMA progress.page_size = {PROGRESS_PAGE_SIZE}")
+        self.cursor.execute("PRAGMA progress.auto_vacuum = INCREMENTAL")
+        self.cursor.execute("PRAGMA progress.journal_mode = WAL")
+        self.cursor.execute("PRAGMA progress.synchronous = NORMAL")
+
+    def init_db(self):
+        # 启动时把旧库原地升级到最新版本；每个迁移单独一个事务。进度库先升级（内容库 v10 往里搬数据）。
+        # 重建表期间必须关闭外键检查（该 PRAGMA 在事务内无效）
+        self.cursor.execute("PRAGMA foreign_keys = OFF")
+        self.migrate('progress', PROGRESS_MIGRATIONS)
+        self.migrate('main', MIGRATIONS)
+        self.cursor.execute("PRAGMA foreign_keys = ON")
+        create_link_triggers(self.cursor)
+        self.sync_progress()
+        self.device_id = self.load_device_id()
+        self.has_fts = self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'words_fts'").fetchone() is not None
+
+    def migrate(self, schema, migrations):
+        version = self.cursor.execute(f"PRAGMA {schema}.user_version").fetchone()[0]
+        for target in range(version + 1, len(migrations) + 1):
+            self.cursor.execute("BEGIN")
+            try:
+                migrations[target - 1](self.cursor)
+                self.cursor.execute(f"PRAGMA {schema}.user_version = {target}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def sync_progress(self):
+        # 两个库各自提交，并不保证一起落盘；打开时补齐缺的进度行、删掉已不存在的词库的进度。
+        # 新单词的 id 总比已有的大（AUTOINCREMENT），只需补进度库里最大 word_id 之后的单词，平时是空操作
+        try:
+            self.cursor.execute("INSERT OR IGNORE INTO progress.library_progress (library_id) SELECT id FROM libraries")
+            # 按 id 从小到大分块补、每块提交，中途退出下次打开时从最大 word_id 接着补
+            while True:
+                self.cursor.execute("INSERT OR IGNORE INTO progress.word_progress (word_id, library_id, gen) "
+                                    "SELECT w.id, w.library_id, g.progress_gen FROM words w JOIN progress.library_progress g ON g.library_id = w.library_id "
+                                    "WHERE w.id > (SELECT COALESCE(MAX(word_id), 0) FROM progress.word_progress) ORDER BY w.id LIMIT ?", (BACKFILL_CHUNK,))
+                if self.cursor.rowcount < BACKFILL_CHUNK: break
+                self.conn.commit()
+            gone = [r[0] for r in self.cursor.execute("SELECT library_id FROM progress.library_progress "
+                                                      "WHERE library_id NOT IN (SELECT id FROM libraries)")]
+            for lib_id in gone:
+                self.cursor.execute("DELETE FROM progress.word_progress WHERE library_id = ?", (lib_id,))
+                self.cursor.execute("DELETE FROM progress.library_progress WHERE library_id = ?", (lib_id,))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def load_device_id(self):
+        # 本机在同步里的标识，第一次用到时随机生成；0 留给升级前的进度
+        value = self.get_setting('device_id')
+        if value is None:
+            value = str(random.getrandbits(62) + 1)
+            self.set_setting('device_id', value)
+        return int(value)
+
+    def current_profile(self):
+        # 还没有 profiles 表（升级前的库）时是默认学习者
+        if not self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'profiles'").fetchone(): return 1
+        return self.cursor.execute("SELECT id FROM profiles ORDER BY last_used DESC LIMIT 1").fetchone()[0]
+
+    def get_profiles(self):
+        self.cursor.execute("SELECT id, name FROM profiles ORDER BY id")
+        return self.cursor.fetchall()
+
+    def add_profile(self, name):
+        # 只登记；进度库在第一次切换过去时才建
+        self.cursor.execute("INSERT INTO profiles (name) VALUES (?)", (name,))
+        self.conn.commit()
+        return self.cursor.lastrowid
+
+    def switch_profile(self, profile_id, prepare=True):
+        # 内容库（单词、搜索索引）所有学习者共用，切换只换掉 attach 的进度库，索引和 TEMP 触发器都不动。
+        # prepare 时还负责升级或新建进度库、补齐进度行（新学习者第一次切换时按现有单词补一遍，之后是空操作）
+        # 并记为当前学习者；读连接在写连接之后切换，只换文件
+        self.flush()
+        self.conn.commit()
+        self.cursor.execute("DETACH DATABASE progress")
+        self.profile_id = profile_id
+        self.attach_progress(profile_path(self.db_name, profile_id))
+        if not prepare: return
+        self.migrate('progress', PROGRESS_MIGRATIONS)
+        self.sync_progress()
+        self.cursor.execute("UPDATE profiles SET last_used = (SELECT MAX(last_used) FROM profiles) + 1 WHERE id = ?", (profile_id,))
+        self.conn.commit()
+
+    def delete_profile(self, profile_id):
+        # 删除登记和进度库文件；当前学习者的进度库还 attach 着，不能删
+        if profile_id == self.profile_id: raise ValueError("不能删除当前学习者")
+        self.cursor.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
+        self.conn.commit()
+        path = profile_path(self.db_name, profile_id)
+        for name in (path, path + '-wal', path + '-shm'):
+            if path != ':memory:' and os.path.exists(name): os.remove(name)
+
+    def add_library(self, name):
+        # 各学习者的 library_progress 行由 TEMP 触发器（当前学习者）和 sync_progress（其他学习者）补上，默认启用
+        self.cursor.execute("INSERT INTO libraries (name) VALUES (?)", (name,))
+        self.conn.commit()
+        return self.cursor.lastrowid
+
+    def get_libraries(self):
+        # is_active 是当前学习者的启用状态
+        self.cursor.execute("SELECT l.id, l.name, g.is_active, COALESCE(SUM(c.n), 0) FROM libraries l "
+                            "JOIN progress.library_progress g ON g.library_id = l.id "
+                            "LEFT JOIN progress.word_counts c ON c.library_id = l.id WHERE l.deleted = 0 GROUP BY l.id")
+        return self.cursor.fetchall()
+
+    def toggle_library_status(self, lib_id, is_active):
+        self.cursor.execute("UPDATE progress.library_progress SET is_active = ? WHERE library_id = ?", (1 if is_active else 0, lib_id))
+        self.conn.commit()
+
+    def delete_library(self, lib_id):
+        # 只打墓碑：所有学习者的查询和统计立即看不到它，单词留给 purge_deleted_libraries
+        self.flush()
+        self.cursor.execute("UPDATE libraries SET deleted = 1 WHERE id = ?", (lib_id,))
+        self.conn.commit()
+
+    def purge_deleted_libraries(self, limit=PURGE_CHUNK):
+        # 删除最多 limit 个已删词库的单词，词库的单词删完后删除词库行；返回处理的行数，为 0 时已清理完毕
+        self.flush()
+        row = self.cursor.execute("SELECT id FROM libraries WHERE deleted = 1 LIMIT 1").fetchone()
+        if not row: return 0
+        try:
+            self.cursor.execute("DELETE FROM words WHERE id IN (SELECT id FROM words WHERE library_id = ? LIMIT ?)", (row[0], limit))
+            count = self.cursor.rowcount
+            # 单词已删完：删除词库行（外键级联兜底删除期间新插入的单词）
+            if count < limit:
+                self.cursor.execute("DELETE FROM libraries WHERE id = ?", (row[0],))
+                count += 1
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return count
+
+    def reclaim_space(self, max_pages=VACUUM_PAGES):
+        # 内容库、进度库各把最多 max_pages 个空闲页还给文件系统，返回两者剩余的空闲页数。
+        # 旧库还不是增量回收模式时，先整体 VACUUM 一次完成转换（只会发生一次）
+        self.flush()
+        free = 0
+        for schema in ('main', 'progress'):
+            if self.cursor.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+                self.cursor.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+                self.cursor.execute(f"VACUUM {schema}")
+            # execute 只单步一次（每步只回收一页），executescript 会把语句执行完
+            self.conn.executescript(f"PRAGMA {schema}.incremental_vacuum({int(max_pages)});")
+            free += self.cursor.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        return free
+
+    def add_word(self, english, chinese, library_id):
+        # 进度行由 TEMP 触发器按词库当前代数补上
+        self.cursor.execute("INSERT OR IGNORE INTO words (english, chinese, library_id) VALUES (?, ?, ?)", (english, chinese, library_id))
+        self.conn.commit()
+
+    def bulk_add_words(self, pairs, library_id, chunk_size=2000, on_chunk=None):
+        # 批量导入：流式消费 pairs，每满一块 executemany 一次并提交，写锁只占一块的时间，写线程不会等到整个导入结束；
+        # 重复的英文（含本次已写入的块）由 (library_id, english) 唯一索引过滤，内存只与块大小有关
+        # on_chunk(inserted, skipped) 每块回调一次，其中抛出的异常只回滚当前块，已提交的块由调用方删掉词库撤销。
+        # pairs 的元素是 (english, chinese)、(english, chinese, extra) 或 (english, chinese, extra, progress)：
+        # extra 为 dict 或 None；progress 为 (status, interval_days, ease, reps, due_at)，还原导出文件里的进度用。
+        # 进度行由 TEMP 触发器随单词插入补上，带进度的单词随后按 (library_id, english) 改写进度
+        sql = "INSERT OR IGNORE INTO words (english, chinese, extra, library_id) VALUES (?, ?, ?, ?)"
+        progress_sql = (f"UPDATE progress.word_progress SET status = ?, interval_days = ?, ease = ?, reps = ?, due_at = ?, {STAMP} "
+                        "WHERE word_id = (SELECT id FROM words WHERE library_id = ? AND english = ?)")
+        total, inserted = 0, 0
+        chunk, progress = [], []
+        def write_chunk():
+            # 写事务从这里才开始，读取 pairs（解析表格）时不占着写锁
+            self.cursor.executemany(sql, chunk)
+            count = self.cursor.rowcount
+            if progress:
+                # 还原的进度算本机的一次改动，同步时会带上；没有进度的块不占用改动序号
+                stamp = self.next_change() + (self.device_id,)
+                self.cursor.executemany(progress_sql, (p[:5] + stamp + p[5:] for p in progress))
+            return count
+        try:
+            for item in pairs:
+                extra = item[2] if len(item) > 2 and item[2] else None
+                chunk.append((item[0], item[1], json.dumps(extra, ensure_ascii=False) if extra else None, library_id))
+                if len(item) > 3 and item[3] and tuple(item[3]) != NEW_PROGRESS:
+                    progress.append(tuple(item[3]) + (library_id, item[0]))
+                if len(chunk) >= chunk_size:
+                    inserted += write_chunk()
+                    total += len(chunk)
+                    self.conn.commit()
+                    time.sleep(IMPORT_YIELD)
+                    chunk, progress = [], []
+                    if on_chunk: on_chunk(inserted, total - inserted)
+            if chunk:
+                inserted += write_chunk()
+                total += len(chunk)
+                if on_chunk: on_chunk(inserted, total - inserted)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return inserted, total - inserted
+
+    def iter_export_rows(self, library_id=None, chunk_size=EXPORT_CHUNK):
+        # 流式产出导出行 (词库名, english, chinese, status, interval_days, ease, reps, due_at, extra)；
+        # library_id 为空时导出所有未删除的词库。用独立游标 fetchmany 分块取，内存只与块大小有关。
+        # 按 (library_id, english) 排序正好走唯一索引，不需要临时排序；进度已过期的行按新词导出
+        self.flush()
+        stale = "p.gen < g.progress_gen"
+        query = (f"SELECT l.name, w.english, w.chinese, {EFFECTIVE_STATUS}, CASE WHEN {stale} THEN 0 ELSE p.interval_days END, "
+                 f"CASE WHEN {stale} THEN {scheduler.DEFAULT_EASE} ELSE p.ease END, CASE WHEN {stale} THEN 0 ELSE p.reps END, "
+                 f"CASE WHEN {stale} THEN NULL ELSE p.due_at END, w.extra {WORD_JOIN} WHERE l.deleted = 0")
+        params = []
+        if library_id is not None:
+            query += " AND w.library_id = ?"
+            params.append(library_id)
+        query += " ORDER BY w.library_id, w.english"
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows: break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def get_words(self, mode='random', filter_status=[0, 1], limit=None, exclude=()):
+        # mode: 'random' 均匀随机，'due' 按复习计划（忽略 filter_status），其余按 id 顺序；
+        # exclude 只对 'due' 生效：排除仍在屏幕上、尚未评分的单词
+        self.flush()
+        if mode == 'due': return self.get_due_words(limit or -1, exclude=exclude)
+        if mode == 'random' and limit: return self.sample_words(filter_status, limit)
+        placeholders = ','.join('?' for _ in filter_status)
+        query = f"SELECT w.id, w.english, w.chinese, {EFFECTIVE_STATUS} {WORD_JOIN} WHERE {EFFECTIVE_STATUS} IN ({placeholders}) AND {ACTIVE_LIBRARY}"
+        if mode == 'random': query += " ORDER BY RANDOM()"
+        else: query += " ORDER BY w.id"
+        if limit: query += f" LIMIT {limit}"
+        self.cursor.execute(query, filter_status)
+        data = self.cursor.fetchall()
+        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3]} for r in data]
+
+    def sample_words(self, filter_status, limit, max_rounds=6):
+        # 拒绝采样：在 [MIN(id), MAX(id)] 中随机抽候选 id，按主键回表，只保留符合条件的；
+        # 候选按抽取顺序接收，每个符合条件的单词被抽中的概率相同，代价只与批量大小成正比。
+        # 符合条件的单词过于稀疏时，剩余名额退回 ORDER BY RANDOM()，此时走索引也只涉及少量行
+        lo, hi = self.cursor.execute("SELECT (SELECT MIN(id) FROM words), (SELECT MAX(id) FROM words)").fetchone()
+        if lo is None: return []
+        status_marks = ','.join('?' for _ in filter_status)
+        picked = {}
+        hit_rate = 1.0
+        for _ in range(max_rounds):
+            need = limit - len(picked)
+            if need <= 0: break
+            n = min(hi - lo + 1, SAMPLE_ROUND_MAX, int(need * 1.5 / hit_rate) + 8)
+            candidates = random.sample(range(lo, hi + 1), n)
+            id_marks = ','.join('?' for _ in candidates)
+            self.cursor.execute(
+                f"SELECT w.id, w.english, w.chinese, {EFFECTIVE_STATUS} {WORD_JOIN} "
+                f"WHERE w.id IN ({id_marks}) AND {EFFECTIVE_STATUS} IN ({status_marks}) AND {ACTIVE_LIBRARY}",
+                candidates + list(filter_status))
+            rows = {r[0]: r for r in self.cursor.fetchall()}
+            hit_rate = max(len(rows) / n, 0.02)
+            for cid in candidates:
+                if cid in rows and cid not in picked:
+                    picked[cid] = rows[cid]
+                    if len(picked) >= limit: break
+        need = limit - len(picked)
+        if need > 0:
+            exclude = list(picked)
+            query = f"SELECT w.id, w.english, w.chinese, {EFFECTIVE_STATUS} {WORD_JOIN} WHERE {EFFECTIVE_STATUS} IN ({status_marks}) AND {ACTIVE_LIBRARY}"
+            if exclude: query += f" AND w.id NOT IN ({','.join('?' for _ in exclude)})"
+            query += f" ORDER BY RANDOM() LIMIT {need}"
+            self.cursor.execute(query, list(filter_status) + exclude)
+            for r in self.cursor.fetchall(): picked[r[0]] = r
+        data = list(picked.values())
+        random.shuffle(data)
+        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3]} for r in data]
+
+    def get_due_words(self, limit, now=None, exclude=()):
+        # 先取已到期的复习词（due_at 索引范围扫描，最早到期的在前），
+        # 不足再按导入顺序补新词（due_at IS NULL，同一索引）；代价与批量成正比。
+        # 进度已被重置、尚未清理的过期行也算新词，最后按 (library_id, gen) 索引逐词库补上
+        now = int(time.time()) if now is None else now
+        exclude = list(exclude)
+        base = f"SELECT w.id, w.english, w.chinese, p.status {WORD_JOIN} WHERE {ACTIVE_LIBRARY} "
+        if exclude: base += f"AND p.word_id NOT IN ({','.join('?' for _ in exclude)}) "
+        self.cursor.execute(base + "AND p.due_at <= ? AND p.gen >= g.progress_gen ORDER BY p.due_at LIMIT ?", exclude + [now, limit])
+        data = self.cursor.fetchall()
+        if limit < 0 or len(data) < limit:
+            self.cursor.execute(base + "AND p.due_at IS NULL ORDER BY p.word_id LIMIT ?", exclude + [limit - len(data) if limit > 0 else -1])
+            data += self.cursor.fetchall()
+        if limit < 0 or len(data) < limit:
+            self.cursor.execute("SELECT l.id, g.progress_gen FROM libraries l JOIN progress.library_progress g ON g.library_id = l.id "
+                                f"WHERE {ACTIVE_LIBRARY} AND g.progress_gen > 0")
+            for lib_id, gen in self.cursor.fetchall():
+                need = limit - len(data) if limit > 0 else -1
+                if need == 0: break
+                rows = self.cursor.execute(base + "AND p.library_id = ? AND p.gen < ? AND p.due_at IS NOT NULL ORDER BY p.gen, p.word_id LIMIT ?",
+                                           exclude + [lib_id, gen, need]).fetchall()
+                data += [(r[0], r[1], r[2], 0) for r in rows]
+        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3]} for r in data]
+
+    def get_words_page(self, status, before_id=None, limit=50):
+        # 键集分页：按 id 倒序，每次从上一页最后一个 id 之后接着取，翻到多深代价都只与页大小有关
+        self.flush()
+        # 过期行的有效状态是 0，不属于待复习 / 已掌握列表；查这两种状态时仍走 (status, rowid) 索引
+        match = "p.status = ? AND p.gen >= g.progress_gen" if status else f"{EFFECTIVE_STATUS} = ?"
+        query = f"SELECT w.id, w.english, w.chinese, {EFFECTIVE_STATUS} {WORD_JOIN} WHERE {match} AND {ACTIVE_LIBRARY}"
+        params = [status]
+        if before_id is not None:
+            query += " AND p.word_id < ?"
+            params.append(before_id)
+        query += " ORDER BY p.word_id DESC LIMIT ?"
+        params.append(limit)
+        self.cursor.execute(query, params)
+        data = self.cursor.fetchall()
+        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3]} for r in data]
+
+    def search_words(self, text, after_id=None, limit=50):
+        # 在所有未删除的词库里搜索（含停用的词库），按 id 键集分页；
+        # 返回 [{'id', 'en', 'cn', 'status', 'library'}]
+        self.flush()
+        params = []
+        if self.has_fts:
+            match = fts_query(text)
+            if match is None: return []
+            query = (f"SELECT w.id, w.english, w.chinese, {EFFECTIVE_STATUS}, l.name FROM words_fts f "
+                     "JOIN words w ON w.id = f.rowid JOIN progress.word_progress p ON p.word_id = w.id "
+                     "JOIN progress.library_progress g ON g.library_id = w.library_id JOIN libraries l ON l.id = w.library_id "
+                     "WHERE words_fts MATCH ? AND l.deleted = 0")
+            params.append(match)
+            if after_id is not None:
+                query += " AND f.rowid > ?"
+                params.append(after_id)
+            query += " ORDER BY f.rowid LIMIT ?"
+        else:
+            text = text.strip()
+            if not text: return []
+            query = (f"SELECT w.id, w.english, w.chinese, {EFFECTIVE_STATUS}, l.name {WORD_JOIN} "
+                     "WHERE (w.english LIKE ? OR w.chinese LIKE ?) AND l.deleted = 0")
+            params += [text + '%', '%' + text + '%']
+            if after_id is not None:
+                query += " AND w.id > ?"
+                params.append(after_id)
+            query += " ORDER BY w.id LIMIT ?"
+        params.append(limit)
+        self.cursor.execute(query, params)
+        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3], 'library': r[4]} for r in self.cursor.fetchall()]
+
+    def count_by_status(self, status):
+        self.flush()
+        self.cursor.execute(f"SELECT COALESCE(SUM(c.n), 0) {ACTIVE_COUNTS} AND c.status = ?", (status,))
+        return self.cursor.fetchone()[0]
+
+    def update_status(self, word_id, status):
+        self.pending.setdefault(word_id, {})['status'] = status
+
+    def flush(self):
+        # 把缓存的进度改动按列组合分组 executemany，一个事务提交；读进度前会先调用它。
+        # 同一次 flush 的改动共用一个同步序号和逻辑时钟
+        if not self.pending: return
+        pending, self.pending = self.pending, {}
+        try:
+            stamp = self.next_change() + (self.device_id,)
+            groups = {}
+            for word_id, values in pending.items():
+                cols = tuple(sorted(values))
+                groups.setdefault(cols, []).append(tuple(values[c] for c in cols) + stamp + (word_id,))
+            for cols, rows in groups.items():
+                assignments = ', '.join(f"{c} = ?" for c in cols)
+                self.cursor.executemany(f"UPDATE progress.word_progress SET {assignments}, {CURRENT_GEN}, {STAMP} WHERE word_id = ?", rows)
+            self.conn.commit()
+        except Exception:
+            # 写入失败（例如库被锁）时把改动放回缓存，之后的 flush 再写；期间新记下的改动优先
+            self.conn.rollback()
+            for word_id, values in pending.items():
+                self.pending[word_id] = {**values, **self.pending.get(word_id, {})}
+            raise
+
+    def grade_word(self, word_id, grade):
+        # 评分交给 SM-2 调度，status 随之更新为 1（待复习）或 2（已掌握）；结果进写缓存
+        pending = self.pending.get(word_id, {})
+        if 'reps' in pending:
+            row = (pending['interval_days'], pending['ease'], pending['reps'])
+        else:
+            self.cursor.execute("SELECT p.interval_days, p.ease, p.reps, p.gen < g.progress_gen FROM progress.word_progress p "
+                                "JOIN progress.library_progress g ON g.library_id = p.library_id WHERE p.word_id = ?", (word_id,))
+            row = self.cursor.fetchone()
+            if not row: return
+            # 进度已被重置的单词从新词开始调度
+            if row[3]: row = (0, scheduler.DEFAULT_EASE, 0)
+        interval, ease, reps, due_at, status = scheduler.review(row[0], row[1], row[2], grade)
+        self.pending[word_id] = {'status': status, 'interval_days': interval, 'ease': ease, 'reps': reps, 'due_at': due_at}
+
+    def reset_word(self, word_id):
+        self.flush()
+        stamp = self.next_change() + (self.device_id,)
+        self.cursor.execute(f"UPDATE progress.word_progress SET {RESET_SCHEDULE}, {CURRENT_GEN}, {STAMP} WHERE word_id = ?", stamp + (word_id,))
+        self.conn.commit()
+
+    def reset_progress(self):
+        # 代价只与词库数有关：各词库代数加一，单词行留给 clean_stale_progress
+        self.flush()
+        stamp = self.next_change() + (self.device_id,)
+        self.cursor.execute(f"UPDATE progress.library_progress SET progress_gen = progress_gen + 1, {RESET_STAMP}", stamp)
+        self.cursor.execute("UPDATE progress.settings SET value = '0' WHERE key = 'tutorial_seen'")
+        self.conn.commit()
+
+    def reset_library_progress(self, lib_id):
+        self.flush()
+        stamp = self.next_change() + (self.device_id,)
+        self.cursor.execute(f"UPDATE progress.library_progress SET progress_gen = progress_gen + 1, {RESET_STAMP} WHERE library_id = ?",
+                            stamp + (lib_id,))
+        self.conn.commit()
+
+    def clean_stale_progress(self, limit=STALE_CHUNK):
+        # 把最多 limit 个过期行真正改回新词并对齐代数，返回处理的行数；为 0 时已清理完毕。
+        # 有效状态不变，计数表净变化为零
+        self.flush()
+        self.cursor.execute("SELECT g.library_id, g.progress_gen FROM progress.library_progress g JOIN libraries l ON l.id = g.library_id "
+                            "WHERE g.progress_gen > 0 AND l.deleted = 0")
+        ids = []
+        for lib_id, gen in self.cursor.fetchall():
+            ids += [r[0] for r in self.cursor.execute("SELECT word_id FROM progress.word_progress WHERE library_id = ? AND gen < ? LIMIT ?",
+                                                      (lib_id, gen, limit - len(ids)))]
+            if len(ids) >= limit: break
+        if not ids: return 0
+        try:
+            self.cursor.executemany(f"UPDATE progress.word_progress SET {RESET_SCHEDULE}, {CURRENT_GEN} WHERE word_id = ?", ((i,) for i in ids))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return len(ids)
+
+    def get_stats(self):
+        self.flush()
+        self.cursor.execute(f"SELECT c.status, SUM(c.n) {ACTIVE_COUNTS} GROUP BY c.status")
+        data = dict(self.cursor.fetchall())
+        return {'new': data.get(0, 0), 'review': data.get(1, 0), 'mastered': data.get(2, 0)}
+
+    def get_total_count(self):
+        self.cursor.execute(f"SELECT COALESCE(SUM(c.n), 0) {ACTIVE_COUNTS}")
+        return self.cursor.fetchone()[0]
+
+    def rebuild_counters(self):
+        # 一次性按进度表全表重算统计表（触发器被绕过或计数异常时使用）
+        self.flush()
+        try:
+            self.cursor.execute("DELETE FROM progress.word_counts")
+            self.cursor.execute(f"INSERT INTO progress.word_counts (library_id, status, n) SELECT p.library_id, {EFFECTIVE_STATUS} AS s, COUNT(*) "
+                                "FROM progress.word_progress p JOIN progress.library_progress g ON g.library_id = p.library_id GROUP BY p.library_id, s")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def check_counters(self):
+        # 一致性检查：与全表聚合结果对比，返回 [(library_id, status, 实际数量, 统计表数量)]，一致时为空
+        self.flush()
+        self.cursor.execute(f"SELECT w.library_id, {EFFECTIVE_STATUS} AS s, COUNT(*) {WORD_JOIN} GROUP BY w.library_id, s")
+        expected = {(r[0], r[1]): r[2] for r in self.cursor.fetchall()}
+        self.cursor.execute("SELECT library_id, status, n FROM progress.word_counts")
+        actual = {(r[0], r[1]): r[2] for r in self.cursor.fetchall()}
+        return [(key[0], key[1], expected.get(key, 0), actual.get(key, 0))
+                for key in sorted(set(expected) | set(actual)) if expected.get(key, 0) != actual.get(key, 0)]
+
+    def get_setting(self, key):
+        # DEVICE_SETTINGS 里的设置整机共用，其余属于当前学习者
+        self.cursor.execute(f"SELECT value FROM {settings_table(key)} WHERE key = ?", (key,))
+        res = self.cursor.fetchone()
+        return res[0] if res else None
+
+    def set_setting(self, key, value):
+        self.cursor.execute(f"REPLACE INTO {settings_table(key)} (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def next_change(self, observed=0):
+        # 本机的下一次改动：序号加一，逻辑时钟取本机与 observed（收到的最大时钟）中较大的再加一。
+        # 在调用方的事务里执行，返回 (seq, clock)
+        self.cursor.execute("UPDATE progress.sync_state SET seq = seq + 1, clock = MAX(clock, ?) + 1", (observed,))
+        return self.cursor.execute("SELECT seq, clock FROM progress.sync_state").fetchone()
+
+    def get_changes(self, since=None):
+        # 本机序号大于 since 的改动（默认为上次导出之后），供 sync.write_changes 写成同步文件：
+        # {'device', 'since', 'upto', 'clock', 'libraries': [(词库名, reset_clock, reset_device)],
+        #  'words': [(词库名, english, status, interval_days, ease, reps, due_at, clock, device)]}。
+        # 单词按 seq 索引只扫改动过的行；之后又被词库重置盖掉的行不导出，重置本身会导出
+        self.flush()
+        upto, clock, exported = self.cursor.execute("SELECT seq, clock, exported_seq FROM progress.sync_state").fetchone()
+        since = exported if since is None else since
+        self.cursor.execute("SELECT l.name, g.reset_clock, g.reset_device FROM progress.library_progress g JOIN libraries l ON l.id = g.library_id "
+                            "WHERE g.reset_seq > ? AND l.deleted = 0", (since,))
+        libraries = self.cursor.fetchall()
+        self.cursor.execute("SELECT l.name, w.english, p.status, p.interval_days, p.ease, p.reps, p.due_at, p.clock, p.device "
+                            "FROM progress.word_progress p JOIN progress.library_progress g ON g.library_id = p.library_id "
+                            "JOIN words w ON w.id = p.word_id JOIN libraries l ON l.id = w.library_id "
+                            "WHERE p.seq > ? AND p.gen >= g.progress_gen AND l.deleted = 0", (since,))
+        return {'device': self.device_id, 'since': since, 'upto': upto, 'clock': clock, 'libraries': libraries, 'words': self.cursor.fetchall()}
+
+    def mark_exported(self, seq):
+        # 同步文件写好之后调用，下次默认从 seq 之后导出
+        self.cursor.execute("UPDATE progress.sync_state SET exported_seq = MAX(exported_seq, ?)", (seq,))
+        self.conn.commit()
+
+    def merge_changes(self, changes):
+        # 合并别的设备导出的改动：按 (clock, device) 后写者胜，两者都相同时比较进度值本身，
+        # 所以两台设备无论谁先合并谁，结果都一样。单词按 (词库名, english) 对应（同名词库取最早的一个），
+        # 本机没有的词库或单词跳过。合并进来的行保留原来的时钟，但记为本机的新改动，下次导出会转给其他设备；
+        # 本机时钟推进到收到的最大时钟之后。代价与文件里的改动数成正比（合并别处的词库重置时要看该词库当前代数的行）。
+        # 返回 (合并的条数, 跳过的条数, 是否缺了这台设备之前的同步文件)
+        if changes['device'] == self.device_id: raise ValueError("这是本机导出的同步文件")
+        self.flush()
+        libraries = {}
+        for lib_id, name in self.cursor.execute("SELECT id, name FROM libraries WHERE deleted = 0 ORDER BY id").fetchall():
+            libraries.setdefault(name, lib_id)
+        applied, skipped = 0, 0
+        try:
+            seq, clock = self.next_change(changes['clock'])
+            for name, reset_clock, reset_device in changes['libraries']:
+                lib_id = libraries.get(name)
+                if lib_id is None:
+                    skipped += 1
+                    continue
+                gen, local_clock, local_device = self.cursor.execute(
+                    "SELECT progress_gen, reset_clock, reset_device FROM progress.library_progress WHERE library_id = ?", (lib_id,)).fetchone()
+                if (reset_clock, reset_device) <= (local_clock, local_device): continue
+                self.cursor.execute(f"UPDATE progress.library_progress SET progress_gen = progress_gen + 1, {RESET_STAMP} WHERE library_id = ?",
+                                    (seq, reset_clock, reset_device, lib_id))
+                # 本机在这次重置之后的改动保留：代数对齐到新的代数
+                self.cursor.execute("UPDATE progress.word_progress SET gen = gen + 1 WHERE library_id = ? AND gen = ? "
+                                    "AND (clock > ? OR (clock = ? AND device > ?))", (lib_id, gen, reset_clock, reset_clock, reset_device))
+                applied += 1
+            rows = []
+            for name, english, *values, row_clock, row_device in changes['words']:
+                lib_id = libraries.get(name)
+                local = lib_id and self.cursor.execute(
+                    "SELECT p.word_id, p.clock, p.device, p.status, p.interval_days, p.ease, p.reps, p.due_at, g.reset_clock, g.reset_device "
+                    "FROM words w JOIN progress.word_progress p ON p.word_id = w.id JOIN progress.library_progress g ON g.library_id = w.library_id "
+                    "WHERE w.library_id = ? AND w.english = ?", (lib_id, english)).fetchone()
+                if not local:
+                    skipped += 1
+                    continue
+                if (row_clock, row_device) <= (local[8], local[9]): continue
+                if (row_clock, row_device, progress_order(values)) <= (local[1], local[2], progress_order(local[3:8])): continue
+                rows.append(tuple(values) + (seq, row_clock, row_device, local[0]))
+            self.cursor.executemany("UPDATE progress.word_progress SET status = ?, interval_days = ?, ease = ?, reps = ?, due_at = ?, "
+                                    f"{STAMP}, {CURRENT_GEN} WHERE word_id = ?", rows)
+            applied += len(rows)
+            received = self.cursor.execute("SELECT received_seq FROM progress.sync_peers WHERE device = ?", (changes['device'],)).fetchone()
+            received = received[0] if received else 0
+            self.cursor.execute("REPLACE INTO progress.sync_peers (device, received_seq) VALUES (?, ?)",
+                                (changes['device'], max(received, changes['upto'])))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return applied, skipped, changes['since'] > received
@@ -0,0 +1,125 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from database import DatabaseManager
+
+# --- 数据库调用计时（可选开启）---
+# attach(db) 把 DatabaseManager 实例上的公开方法换成计时包装，并在连接上挂 SQL 跟踪回调；
+# detach(db) 删掉这些实例属性即恢复成类方法，关闭时调用路径和原来完全一样，没有额外开销。
+# 统计是进程级的，读写线程、导入线程的连接共用一份，由锁保护；attach / detach 必须在连接所属线程上调用
+
+log = logging.getLogger(__name__)
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收所有更慢的调用
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500)
+SLOW_LOG_SIZE = 100
+# 每次慢调用最多记录多少条 SQL（executemany 会逐行触发跟踪回调）
+SLOW_SQL_MAX = 20
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+PROFILED_METHODS = [name for name, value in vars(DatabaseManager).items() if callable(value) and not name.startswith('_')]
+
+
+class Profiler:
+    def __init__(self, slow_ms=50):
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.methods = {}
+            self.slow = deque(maxlen=SLOW_LOG_SIZE)
+            self.started = time.time()
+
+    def attach(self, db):
+        if getattr(db, 'profiled', False): return
+        # depth 区分最外层调用（get_words 内部还会调用 flush 等）；只有最外层收集 SQL 做慢查询记录
+        state = {'depth': 0, 'sql': []}
+        def trace(sql):
+            if state['depth'] and len(state['sql']) < SLOW_SQL_MAX and not sql.startswith('--'): state['sql'].append(sql)
+        db.conn.set_trace_callback(trace)
+        for name in PROFILED_METHODS:
+            setattr(db, name, self.wrap(db, name, getattr(DatabaseManager, name), state))
+        db.profiled = True
+
+    def detach(self, db):
+        if not getattr(db, 'profiled', False): return
+        db.conn.set_trace_callback(None)
+        for name in PROFILED_METHODS: delattr(db, name)
+        db.profiled = False
+
+    def wrap(self, db, name, fn, state):
+        def call(*args, **kwargs):
+            outer = state['depth'] == 0
+            if outer: state['sql'] = []
+            state['depth'] += 1
+            changes = db.conn.total_changes
+            start = time.perf_counter()
+            try:
+                result = fn(db, *args, **kwargs)
+            finally:
+                state['depth'] -= 1
+            ms = (time.perf_counter() - start) * 1000
+            # 行数：返回列表的按返回行数计，其余按改动的行数（含触发器的改动）计
+            rows = len(result) if isinstance(result, list) else db.conn.total_changes - changes
+            self.record(name, ms, rows)
+            if outer and ms >= self.slow_ms: self.log_slow(db, name, ms, state['sql'])
+            return result
+        return call
+
+    def record(self, name, ms, rows):
+        with self.lock:
+            entry = self.methods.get(name)
+            if entry is None:
+                entry = self.methods[name] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'histogram': [0] * (len(BUCKETS_MS) + 1)}
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['rows'] += rows
+            bucket = 0
+            while bucket < len(BUCKETS_MS) and ms >= BUCKETS_MS[bucket]: bucket += 1
+            entry['histogram'][bucket] += 1
+
+    def log_slow(self, db, name, ms, statements):
+        queries = []
+        for sql in statements:
+            plan = []
+            if sql.lstrip().upper().startswith(EXPLAINABLE):
+                try:
+                    plan = [row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                except Exception as e:
+                    plan = [f"EXPLAIN 失败: {e}"]
+            queries.append({'sql': sql, 'plan': plan})
+        log.warning("慢数据库调用 %s %.1f ms", name, ms)
+        with self.lock:
+            self.slow.append({'method': name, 'ms': round(ms, 2), 'time': time.strftime('%H:%M:%S'),
+                              'thread': threading.current_thread().name, 'queries': queries})
+
+    def snapshot(self):
+        labels = [f"<{b}" for b in BUCKETS_MS] + [f">={BUCKETS_MS[-1]}"]
+        with self.lock:
+            methods = {
+                name: {
+                    'calls': e['calls'],
+                    'total_ms': round(e['total_ms'], 2),
+                    'mean_ms': round(e['total_ms'] / e['calls'], 3),
+                    'max_ms': round(e['max_ms'], 2),
+                    'rows': e['rows'],
+                    'histogram_ms': dict(zip(labels, e['histogram'])),
+                }
+                for name, e in self.methods.items()
+            }
+            return {'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                    'slow_ms': self.slow_ms, 'methods': methods, 'slow': list(self.slow)}
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+profiler = Profiler()
@@ -0,0 +1,105 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DatabaseManager
+from dbprofile import profiler
+
+# --- 数据库线程服务 ---
+# 写连接和读连接各自独占一个线程（sqlite 连接不能跨线程使用），UI 线程只提交请求；
+# 结果通过 Future 返回，或经 dispatch 把回调交回 UI 线程。WAL 模式下读请求可与写并发执行。
+# 读请求会先等待在它之前提交的写请求完成，保证读到自己刚写入的数据
+
+log = logging.getLogger(__name__)
+
+# 走读连接的 DatabaseManager 方法
+READ_METHODS = {
+    'get_words', 'sample_words', 'get_due_words', 'get_words_page', 'count_by_status',
+    'get_libraries', 'get_stats', 'get_total_count', 'get_setting', 'check_counters', 'get_profiles', 'search_words',
+}
+# 只进写缓存、不立即提交的方法；之后的读请求需要先 flush
+BUFFERED_METHODS = {'grade_word', 'update_status'}
+
+
+class DatabaseService:
+    def __init__(self, db_name='vocab.db', dispatch=None, progress_name=None):
+        # dispatch(fn) 负责在 UI 线程上调用 fn；默认直接在工作线程里调用
+        self.db_name = db_name
+        self.dispatch = dispatch or (lambda fn: fn())
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        self.reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-read')
+        # 建库与迁移先在写线程上完成，读连接随后打开；progress_name 为空时两者都打开当前学习者的进度库。
+        # self.progress_name 是正在用的进度库文件，后台任务的连接也打开它
+        self.write_db = self.writer.submit(DatabaseManager, db_name, progress_name).result()
+        self.read_db = self.reader.submit(DatabaseManager, db_name, progress_name).result()
+        self.progress_name = self.write_db.progress_name
+        self.last_write = None
+        self.needs_flush = False
+
+    def call(self, method, *args, callback=None, on_error=None, **kwargs):
+        # 按方法名调用 DatabaseManager：读方法走读线程，其余走写线程
+        job = lambda d: getattr(d, method)(*args, **kwargs)
+        if method in READ_METHODS: return self.read(job, callback, on_error)
+        future = self.write(job, callback, on_error)
+        if method in BUFFERED_METHODS: self.needs_flush = True
+        return future
+
+    def read(self, fn, callback=None, on_error=None):
+        # fn(db) 在读线程上执行；fn 内只能调用只读方法
+        if self.needs_flush: self.flush()
+        barrier = self.last_write
+        def job():
+            if barrier: barrier.exception()
+            return fn(self.read_db)
+        return self._submit(self.reader, job, callback, on_error)
+
+    def write(self, fn, callback=None, on_error=None):
+        # fn(db) 在写线程上执行，写请求之间严格按提交顺序
+        future = self._submit(self.writer, lambda: fn(self.write_db), callback, on_error)
+        self.last_write = future
+        return future
+
+    def flush(self, wait=False):
+        self.needs_flush = False
+        future = self.write(lambda d: d.flush())
+        if wait: future.result()
+        return future
+
+    def switch_profile(self, profile_id, callback=None, on_error=None):
+        # 写连接先切换（先落盘缓存的进度、准备好新进度库），读连接等它完成后再换文件；
+        # 写连接失败时读连接保持原样，异常交给 on_error。之后提交的请求都落在新学习者上
+        self.needs_flush = False
+        switched = self.write(lambda d: d.switch_profile(profile_id))
+        def job(d):
+            switched.result()
+            d.switch_profile(profile_id, prepare=False)
+            self.progress_name = d.progress_name
+            return profile_id
+        return self.read(job, callback, on_error)
+
+    def set_profiling(self, enabled):
+        # 计时包装和跟踪回调要在各连接自己的线程上挂载 / 卸下
+        profiler.enabled = enabled
+        action = profiler.attach if enabled else profiler.detach
+        self.writer.submit(action, self.write_db)
+        self.reader.submit(action, self.read_db)
+
+    def close(self):
+        self.flush(wait=True)
+        self.writer.submit(lambda: self.write_db.conn.close()).result()
+        self.reader.submit(lambda: self.read_db.conn.close()).result()
+        self.writer.shutdown()
+        self.reader.shutdown()
+
+    def _submit(self, executor, job, callback, on_error):
+        future = executor.submit(job)
+        future.add_done_callback(lambda f: self._done(f, callback, on_error))
+        return future
+
+    def _done(self, future, callback, on_error):
+        error = future.exception()
+        if error is not None:
+            if on_error: self.dispatch(lambda: on_error(error))
+            else: log.error("数据库请求失败", exc_info=error)
+        elif callback:
+            result = future.result()
+            self.dispatch(lambda: callback(result))
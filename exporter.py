@@ -0,0 +1,79 @@
+import csv
+import os
+
+# --- 词库流式导出 ---
+# rows 是数据库按块读出的行的迭代器，边读边写，不在内存里攒整个词库；
+# 先写到 .part 临时文件，写完才改名，取消或失败不会留下半个文件。
+# 表头固定为 EXPORT_HEADER，导入时据此识别出本应用导出的文件，连同进度原样还原
+
+EXPORT_HEADER = ['词库', '英文', '中文', '状态', '间隔天数', '难度系数', '复习次数', '到期时间', '附加信息']
+PROGRESS_EVERY = 1000
+# 以这些字符开头的文本会被表格软件当成公式：CSV 里加单引号前缀（本身以单引号开头的也加，导入时去掉一个即可还原），
+# xlsx 里显式写成字符串单元格
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+QUOTE = "'"
+
+
+def quote_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES + (QUOTE,)): return QUOTE + value
+    return value
+
+
+def unquote_formula(text):
+    # quote_formula 的逆操作，导入 CSV 导出文件时用
+    if text.startswith(QUOTE) and text[1:].startswith(FORMULA_PREFIXES + (QUOTE,)): return text[1:]
+    return text
+
+
+def write_csv(path, rows, on_progress=None):
+    # 带 BOM 的 UTF-8：Excel 直接打开不乱码，导入时的编码检测也认
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADER)
+        for row in rows:
+            writer.writerow([quote_formula(v) for v in row])
+            count += 1
+            if on_progress and count % PROGRESS_EVERY == 0: on_progress(count)
+    return count
+
+
+def write_xlsx(path, rows, on_progress=None):
+    # write_only 模式逐行写出到临时文件，内存不随行数增长
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('词库')
+    ws.append(EXPORT_HEADER)
+    def text_cell(value):
+        cell = WriteOnlyCell(ws, value)
+        cell.data_type = 's'
+        return cell
+    count = 0
+    try:
+        for row in rows:
+            ws.append([text_cell(v) if isinstance(v, str) and v.startswith(FORMULA_PREFIXES) else v for v in row])
+            count += 1
+            if on_progress and count % PROGRESS_EVERY == 0: on_progress(count)
+    except BaseException:
+        # 中途放弃时先收尾工作表的临时文件流，否则它被回收时会往已关闭的文件里写
+        ws.close()
+        raise
+    wb.save(path)
+    return count
+
+
+def export_words(path, rows, on_progress=None):
+    # on_progress(count) 每写 PROGRESS_EVERY 行回调一次；返回写出的行数
+    lower = path.lower()
+    if lower.endswith('.csv'): writer = write_csv
+    elif lower.endswith('.xlsx'): writer = write_xlsx
+    else: raise ValueError(f"不支持的文件类型: {path}")
+    part = path + '.part'
+    try:
+        count = writer(part, rows, on_progress)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part): os.remove(part)
+        raise
+    return count
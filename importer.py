@@ -0,0 +1,189 @@
+import csv
+import codecs
+import itertools
+import json
+import os
+import re
+
+import scheduler
+from exporter import EXPORT_HEADER, unquote_formula
+
+# --- 词库文件流式读取 ---
+# 每个读取器都是生成器：逐行产出原始单元格，不把整个文件读进内存
+
+CJK_RE = re.compile(r'[\u4e00-\u9fa5]')
+# 英文列的单元格：整格是字母或数字开头的单词或短语（任何文字的字母，如 café、Zürich；允许空格、连字符、撇号、点），
+# 且至少含一个字母，序号列这种纯数字的格子不算
+WORD_RE = re.compile(r"(?=[\w .'’\-]*[^\W\d_])[^\W_][\w .'’\-]*$")
+PROGRESS_EVERY = 1000
+# 判断哪一列是英文、哪一列是中文时抽样的行数
+SAMPLE_ROWS = 50
+
+
+def detect_csv_encoding(path, block_size=1 << 20):
+    # 分块增量解码整份文件，内存只占一个块；UTF-8 失败则回退 GBK
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    decoder.decode(b'', final=True)
+                    break
+                decoder.decode(block)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gbk'
+
+
+def iter_csv_rows(path, on_progress=None):
+    encoding = detect_csv_encoding(path)
+    size = os.path.getsize(path) or 1
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        for i, row in enumerate(csv.reader(f)):
+            if on_progress and i % PROGRESS_EVERY == 0: on_progress(f.buffer.tell() / size)
+            yield row
+
+
+def iter_xlsx_rows(path, on_progress=None):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        total = ws.max_row or 0
+        for i, row in enumerate(ws.iter_rows(values_only=True)):
+            if on_progress and total and i % PROGRESS_EVERY == 0: on_progress(i / total)
+            yield row
+    finally:
+        wb.close()
+
+
+def iter_xls_rows(path, on_progress=None):
+    # xlrd 无法逐行解析单个 sheet，只能按需加载 sheet 并逐行取值，用完立即释放
+    import xlrd
+    book = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for rx in range(sheet.nrows):
+            if on_progress and rx % PROGRESS_EVERY == 0: on_progress(rx / sheet.nrows)
+            yield sheet.row_values(rx)
+    finally:
+        book.release_resources()
+
+
+def iter_rows(path, on_progress=None):
+    # on_progress(fraction) 按大致读取比例 (0~1) 定期回调
+    lower = path.lower()
+    if lower.endswith('.csv'): return iter_csv_rows(path, on_progress)
+    if lower.endswith('.xlsx'): return iter_xlsx_rows(path, on_progress)
+    if lower.endswith('.xls'): return iter_xls_rows(path, on_progress)
+    raise ValueError(f"不支持的文件类型: {path}")
+
+
+def cell_text(value):
+    return '' if value is None else str(value).strip()
+
+
+def detect_columns(sample):
+    # 按抽样行给每一列计数：含中文的格子最多的是中文列；其余列里整格是英文单词的格子最多、
+    # 平均长度最短（区分单词列和例句列）的是英文列；没有像单词的格子时退而取不含中文的格子最多的列；
+    # 同分取靠左的列。判断不出来时返回 None
+    stats = {}
+    for row in sample:
+        for i, value in enumerate(row):
+            text = cell_text(value)
+            if not text: continue
+            s = stats.setdefault(i, [0, 0, 0, 0])  # 非空格数, 含中文, 英文单词, 总长度
+            s[0] += 1
+            if CJK_RE.search(text): s[1] += 1
+            elif WORD_RE.match(text): s[2] += 1
+            s[3] += len(text)
+    if not stats: return None
+    cn = max(stats, key=lambda i: (stats[i][1], -i))
+    candidates = [i for i in stats if i != cn and stats[i][0] > stats[i][1]]
+    if not stats[cn][1] or not candidates: return None
+    en = max(candidates, key=lambda i: (stats[i][2], stats[i][0] - stats[i][1], -stats[i][3] / stats[i][0], -i))
+    return en, cn
+
+
+def parse_columns(text):
+    # 用户指定的 "英文列,中文列"：列字母（A,B）或从 1 开始的列号（1,2），返回从 0 开始的 (en, cn)；
+    # 留空返回 None（自动判断），写法不对抛 ValueError
+    parts = [p.strip().upper() for p in re.split(r'[,，\s]+', text.strip()) if p.strip()]
+    if not parts: return None
+    if len(parts) != 2: raise ValueError("请按 英文列,中文列 填写，如 A,B")
+    columns = []
+    for part in parts:
+        if part.isdigit() and int(part) > 0: columns.append(int(part) - 1)
+        elif re.fullmatch(r'[A-Z]{1,3}', part):
+            columns.append(sum((ord(c) - 64) * 26 ** k for k, c in enumerate(reversed(part))) - 1)
+        else: raise ValueError(f"无法识别的列: {part}")
+    if columns[0] == columns[1]: raise ValueError("英文列和中文列不能相同")
+    return tuple(columns)
+
+
+def iter_word_pairs(rows, columns=None, keep_extra=True):
+    # 先抽样前 SAMPLE_ROWS 行确定 (英文列, 中文列)，columns 可直接指定（从 0 开始的列号）；
+    # 之后每行只取这两列。其余非空列作为 extra {列名: 值} 一并产出，第一行不是单词时当作表头提供列名。
+    # 产出 (english, chinese, extra)，extra 没有内容时为 None；判断不出列时抛 ValueError，不会静默导入空词库
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, SAMPLE_ROWS))
+    if columns is None: columns = detect_columns(sample)
+    if columns is None: raise ValueError("判断不出英文列和中文列，请手动指定列后重试")
+    en_col, cn_col = columns
+    labels = None
+    for n, row in enumerate(itertools.chain(sample, rows)):
+        en = cell_text(row[en_col]) if en_col < len(row) else ''
+        cn = cell_text(row[cn_col]) if cn_col < len(row) else ''
+        if not en or not cn or CJK_RE.search(en) or not CJK_RE.search(cn):
+            if n == 0: labels = [cell_text(v) for v in row]
+            continue
+        extra = None
+        if keep_extra:
+            for i, value in enumerate(row):
+                if i == en_col or i == cn_col: continue
+                text = cell_text(value)
+                if not text: continue
+                if extra is None: extra = {}
+                extra[labels[i] if labels and i < len(labels) and labels[i] else f"列{i + 1}"] = text
+        yield en, cn, extra
+
+
+# --- 本应用导出的文件 ---
+
+def is_export_header(row):
+    return [cell_text(v) for v in row[:len(EXPORT_HEADER)]] == EXPORT_HEADER
+
+
+def cell_number(value, cast, default):
+    # CSV 里是文本，xlsx 里是数字；空格或无法解析时取默认值
+    text = cell_text(value)
+    if not text: return default
+    try:
+        return cast(float(text))
+    except ValueError:
+        return default
+
+
+def iter_export_records(rows, quoted=False):
+    # 按 EXPORT_HEADER 的列解析（跳过表头），产出 (词库名, english, chinese, extra, progress)，
+    # progress 为 (status, interval_days, ease, reps, due_at)；导出的内容原样还原，不再做中英文判断。
+    # quoted 为真（CSV 导出文件）时去掉导出时防公式加的单引号前缀
+    text = (lambda v: unquote_formula(cell_text(v))) if quoted else cell_text
+    for row in rows:
+        row = list(row) + [None] * (len(EXPORT_HEADER) - len(row))
+        if is_export_header(row): continue
+        library, en, cn = text(row[0]), text(row[1]), text(row[2])
+        if not en or not cn: continue
+        status = cell_number(row[3], int, 0)
+        if status not in (0, 1, 2): status = 0
+        progress = (status, cell_number(row[4], int, 0), cell_number(row[5], float, scheduler.DEFAULT_EASE),
+                    cell_number(row[6], int, 0), cell_number(row[7], int, None))
+        raw = extra = text(row[8])
+        if extra:
+            try:
+                extra = json.loads(extra)
+            except ValueError:
+                extra = None
+            if not isinstance(extra, dict): extra = {EXPORT_HEADER[8]: raw}
+        yield library or '导入的词库', en, cn, extra or None, progress
@@ -1,9 +1,10 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
+import itertools
 import os
-import sqlite3
-import random
 import re
-import shutil
-import csv
+import threading
 from kivy.config import Config
 
 # --- 1. 窗口配置 ---
@@ -15,31 +16,46 @@ Config.set('graphics', 'resizable', '0')
 from kivy.lang import Builder
 from kivy.core.window import Window
 from kivy.properties import StringProperty, BooleanProperty, NumericProperty, ListProperty
-from kivy.uix.screenmanager import ScreenManager, Screen
+from kivy.uix.screenmanager import Screen
 from kivy.uix.label import Label
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.animation import Animation
+from kivy.clock import Clock
 from kivy.core.text import LabelBase
 from kivy.metrics import dp
+from kivy.logger import Logger
 from kivymd.app import MDApp
 from kivymd.uix.card import MDCard
-from kivymd.uix.filemanager import MDFileManager
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.gridlayout import MDGridLayout
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDFlatButton, MDFloatingActionButton
-from kivymd.uix.selectioncontrol import MDCheckbox
+# 文件管理器、对话框、openpyxl / xlrd 都在第一次用到时才导入，不拖慢启动
+from importer import iter_rows, iter_word_pairs, parse_columns, is_export_header, iter_export_records
+from exporter import export_words
+from wordpack import WordPack, PACK_EXT
+from sync import SYNC_EXT, export_changes, import_changes
+from database import DatabaseManager
+from dbservice import DatabaseService
+from dbprofile import profiler
+import scheduler
+
+# --- 3. 启动计时 ---
+# 各阶段距进程导入 main 的耗时，写入日志并保留在 STARTUP_PHASES 里
+STARTUP_PHASES = []
+
+def mark_startup(phase):
+    elapsed = (time.perf_counter() - STARTUP_T0) * 1000
+    STARTUP_PHASES.append((phase, elapsed))
+    Logger.info(f"Startup: {phase} {elapsed:.0f} ms")
+
+mark_startup('imports')
 
-# --- 3. 字体设置 ---
+# --- 4. 字体设置 ---
+# 缺少打包字体时直接注册系统字体，不再在启动时复制几 MB 的字体文件
 FONT_PATH = 'font.ttf'
 SYSTEM_FONT = 'C:/Windows/Fonts/msyh.ttc'
 
-if not os.path.exists(FONT_PATH):
-    if os.path.exists(SYSTEM_FONT):
-        try:
-            shutil.copyfile(SYSTEM_FONT, FONT_PATH)
-        except: pass
-
-REGISTER_PATH = FONT_PATH if os.path.exists(FONT_PATH) else 'Roboto'
+if os.path.exists(FONT_PATH): REGISTER_PATH = FONT_PATH
+elif os.path.exists(SYSTEM_FONT): REGISTER_PATH = SYSTEM_FONT
+else: REGISTER_PATH = 'Roboto'
 
 LabelBase.register(name='GlobalFont', 
                    fn_regular=REGISTER_PATH, 
@@ -47,7 +63,7 @@ LabelBase.register(name='GlobalFont',
                    fn_italic=REGISTER_PATH,
                    fn_bolditalic=REGISTER_PATH)
 
-# --- 4. 自定义 Toast ---
+# --- 5. 自定义 Toast ---
 def show_toast(text):
     label = Label(text=text, font_name='GlobalFont', font_size='16sp', color=(1, 1, 1, 1), padding=(dp(20), dp(10)))
     from kivy.graphics import Color, RoundedRectangle
@@ -68,135 +84,21 @@ def show_toast(text):
     anim.bind(on_complete=lambda *x: Window.remove_widget(label))
     anim.start(label)
 
-# --- 5. 数据库管理 ---
-class DatabaseManager:
-    def __init__(self, db_name='vocab.db'):
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
-        self.init_db()
-
-    def init_db(self):
-        self.cursor.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-        self.cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('tutorial_seen', '0')")
-        self.cursor.execute("CREATE TABLE IF NOT EXISTS libraries (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, is_active INTEGER DEFAULT 1)")
-        self.cursor.execute("CREATE TABLE IF NOT EXISTS words (id INTEGER PRIMARY KEY AUTOINCREMENT, english TEXT, chinese TEXT, status INTEGER DEFAULT 0, library_id INTEGER DEFAULT 1)")
-        columns = [i[1] for i in self.cursor.execute("PRAGMA table_info(words)")]
-        if 'library_id' not in columns:
-            self.cursor.execute("ALTER TABLE words ADD COLUMN library_id INTEGER DEFAULT 1")
-            self.cursor.execute("INSERT OR IGNORE INTO libraries (id, name, is_active) VALUES (1, '默认词库', 1)")
-        self.conn.commit()
-
-    def add_library(self, name):
-        self.cursor.execute("INSERT INTO libraries (name, is_active) VALUES (?, 1)", (name,))
-        self.conn.commit()
-        return self.cursor.lastrowid
-
-    def get_libraries(self):
-        self.cursor.execute("SELECT l.id, l.name, l.is_active, COUNT(w.id) FROM libraries l LEFT JOIN words w ON l.id = w.library_id GROUP BY l.id")
-        return self.cursor.fetchall()
-
-    def toggle_library_status(self, lib_id, is_active):
-        self.cursor.execute("UPDATE libraries SET is_active = ? WHERE id = ?", (1 if is_active else 0, lib_id))
-        self.conn.commit()
-
-    def delete_library(self, lib_id):
-        self.cursor.execute("DELETE FROM words WHERE library_id = ?", (lib_id,))
-        self.cursor.execute("DELETE FROM libraries WHERE id = ?", (lib_id,))
-        self.conn.commit()
-
-    def add_word(self, english, chinese, library_id):
-        self.cursor.execute("SELECT id FROM words WHERE english=? AND library_id=?", (english, library_id))
-        if not self.cursor.fetchone():
-            self.cursor.execute("INSERT INTO words (english, chinese, library_id) VALUES (?, ?, ?)", (english, chinese, library_id))
-            self.conn.commit()
-
-    def get_words(self, mode='random', filter_status=[0, 1], limit=None):
-        placeholders = ','.join('?' for _ in filter_status)
-        query = f"SELECT w.id, w.english, w.chinese, w.status FROM words w JOIN libraries l ON w.library_id = l.id WHERE w.status IN ({placeholders}) AND l.is_active = 1"
-        if mode == 'random': query += " ORDER BY RANDOM()"
-        else: query += " ORDER BY w.id"
-        if limit: query += f" LIMIT {limit}"
-        self.cursor.execute(query, filter_status)
-        data = self.cursor.fetchall()
-        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3]} for r in data]
-
-    def get_all_words_by_status(self, status):
-        query = "SELECT w.id, w.english, w.chinese, w.status FROM words w JOIN libraries l ON w.library_id = l.id WHERE w.status = ? AND l.is_active = 1 ORDER BY w.id DESC"
-        self.cursor.execute(query, (status,))
-        data = self.cursor.fetchall()
-        return [{'id': r[0], 'en': r[1], 'cn': r[2], 'status': r[3]} for r in data]
-
-    def update_status(self, word_id, status):
-        self.cursor.execute("UPDATE words SET status = ? WHERE id = ?", (status, word_id))
-        self.conn.commit()
-    
-    def reset_progress(self):
-        self.cursor.execute("UPDATE words SET status = 0")
-        self.cursor.execute("UPDATE settings SET value = '0' WHERE key = 'tutorial_seen'")
-        self.conn.commit()
-
-    def get_stats(self):
-        query = "SELECT w.status, COUNT(*) FROM words w JOIN libraries l ON w.library_id = l.id WHERE l.is_active = 1 GROUP BY w.status"
-        self.cursor.execute(query)
-        data = dict(self.cursor.fetchall())
-        return {'new': data.get(0, 0), 'review': data.get(1, 0), 'mastered': data.get(2, 0)}
-
-    def get_total_count(self):
-        query = "SELECT COUNT(*) FROM words w JOIN libraries l ON w.library_id = l.id WHERE l.is_active = 1"
-        self.cursor.execute(query)
-        res = self.cursor.fetchone()
-        return res[0] if res else 0
-
-    def get_setting(self, key):
-        self.cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        res = self.cursor.fetchone()
-        return res[0] if res else None
-
-    def set_setting(self, key, value):
-        self.cursor.execute("REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        self.conn.commit()
-
-db = DatabaseManager()
-
-# --- 6. KV 界面设计 ---
+# --- 6. 数据库管理 ---
+# 在 VocabApp.build 中打开，导入 main 本身不会创建 vocab.db。
+# db 是 DatabaseService：查询和写入都在数据库线程上执行，UI 线程只提交请求，结果回调回到 UI 线程
+db = None
+
+def on_ui_thread(fn):
+    Clock.schedule_once(lambda dt: fn())
+
+# --- 7. KV 界面设计 ---
+# 启动时只加载首页；其余界面的规则在第一次进入时才加载（见 VocabApp.goto）
 KV = '''
 #:import FadeTransition kivy.uix.screenmanager.FadeTransition
 ScreenManager:
     transition: FadeTransition()
     HomeScreen:
-    LibraryScreen:
-    ImportScreen:
-    StudyScreen:
-    DetailScreen:
-
-<TutorialDialogContent>:
-    orientation: "vertical"
-    spacing: dp(10)
-    size_hint_y: None
-    height: dp(180)
-    MDLabel:
-        text: "👈 左滑：标记为【熟知】(不再出现)"
-        theme_text_color: "Primary"
-    MDLabel:
-        text: "👉 右滑：标记为【陌生】(加入复习)"
-        theme_text_color: "Primary"
-    MDLabel:
-        text: "👆 点击：显示/隐藏 单词释义"
-        theme_text_color: "Primary"
-    Widget:
-    MDBoxLayout:
-        adaptive_height: True
-        spacing: dp(10)
-        MDCheckbox:
-            id: checkbox
-            size_hint: None, None
-            size: dp(48), dp(48)
-            pos_hint: {'center_y': .5}
-        MDLabel:
-            text: "不再提示"
-            theme_text_color: "Secondary"
-            font_style: "Caption"
-            pos_hint: {'center_y': .5}
 
 <HomeGridCard@MDCard>:
     orientation: "vertical"
@@ -233,9 +135,20 @@ ScreenManager:
                     bold: True
                     theme_text_color: "Custom"
                     text_color: 1, 1, 1, 1
+                    on_touch_down: if self.collide_point(*args[1].pos): root.on_title_tap()
                 MDBoxLayout:
                     adaptive_width: True
                     spacing: dp(10)
+                    MDIconButton:
+                        icon: "account-switch"
+                        theme_text_color: "Custom"
+                        text_color: 1, 1, 1, 1
+                        on_release: root.show_profile_dialog()
+                    MDIconButton:
+                        icon: "magnify"
+                        theme_text_color: "Custom"
+                        text_color: 1, 1, 1, 1
+                        on_release: app.goto('search')
                     MDIconButton:
                         icon: "restart"
                         theme_text_color: "Custom"
@@ -252,6 +165,11 @@ ScreenManager:
                 font_style: "H6"
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 0.8
+            MDLabel:
+                text: "学习者：" + app.profile_name
+                font_style: "Caption"
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 0.7
             Widget: 
 
         MDGridLayout:
@@ -346,8 +264,8 @@ ScreenManager:
             orientation: "horizontal"
             size_hint_y: None
             height: dp(60)
-            padding: [dp(30), dp(0)]
-            spacing: dp(20)
+            padding: [dp(20), dp(0)]
+            spacing: dp(10)
             MDLabel:
                 text: "本次背诵数量:"
                 halign: "right"
@@ -365,6 +283,19 @@ ScreenManager:
                 pos_hint: {"center_y": .5}
                 halign: "center"
                 line_color_normal: app.theme_cls.primary_color
+            MDBoxLayout:
+                size_hint_x: 0.3
+                MDCheckbox:
+                    size_hint: None, None
+                    size: dp(40), dp(40)
+                    pos_hint: {"center_y": .5}
+                    active: app.continuous_session
+                    on_active: app.set_continuous_session(self.active)
+                MDLabel:
+                    text: "连续"
+                    font_style: "Caption"
+                    theme_text_color: "Secondary"
+                    pos_hint: {"center_y": .5}
         Widget: 
 
         MDCard:
@@ -373,7 +304,7 @@ ScreenManager:
             elevation: 0
             radius: [25, 25, 0, 0]
             md_bg_color: (0.9, 0.92, 0.95, 1) if app.theme_cls.theme_style == 'Light' else (0.2, 0.2, 0.2, 1)
-            on_release: root.manager.current = 'library'
+            on_release: app.goto('library')
             ripple_behavior: True
             MDRelativeLayout:
                 MDIcon:
@@ -390,7 +321,40 @@ ScreenManager:
                     bold: True
                     theme_text_color: "Primary"
                     pos_hint: {"center_x": .5, "center_y": .5}
+'''
 
+LAZY_KV = {
+    'tutorial': '''
+<TutorialDialogContent>:
+    orientation: "vertical"
+    spacing: dp(10)
+    size_hint_y: None
+    height: dp(180)
+    MDLabel:
+        text: "👈 左滑：标记为【熟知】(按记忆曲线复习)"
+        theme_text_color: "Primary"
+    MDLabel:
+        text: "👉 右滑：标记为【陌生】(加入复习)"
+        theme_text_color: "Primary"
+    MDLabel:
+        text: "👆 点击：显示/隐藏 单词释义"
+        theme_text_color: "Primary"
+    Widget:
+    MDBoxLayout:
+        adaptive_height: True
+        spacing: dp(10)
+        MDCheckbox:
+            id: checkbox
+            size_hint: None, None
+            size: dp(48), dp(48)
+            pos_hint: {'center_y': .5}
+        MDLabel:
+            text: "不再提示"
+            theme_text_color: "Secondary"
+            font_style: "Caption"
+            pos_hint: {'center_y': .5}
+''',
+    'library': '''
 <LibraryScreen>:
     name: 'library'
     on_enter: root.load_libraries()
@@ -407,7 +371,7 @@ ScreenManager:
                 icon: "arrow-left"
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 1
-                on_release: root.manager.current = 'home'
+                on_release: app.goto('home')
                 pos_hint: {"center_y": .5}
             MDLabel:
                 text: "我的词库"
@@ -416,6 +380,18 @@ ScreenManager:
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 1
                 pos_hint: {"center_y": .5}
+            MDIconButton:
+                icon: "sync"
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 1
+                on_release: app.goto('sync')
+                pos_hint: {"center_y": .5}
+            MDIconButton:
+                icon: "file-export"
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 1
+                on_release: root.export_all()
+                pos_hint: {"center_y": .5}
         MDScrollView:
             MDBoxLayout:
                 id: lib_container
@@ -427,7 +403,7 @@ ScreenManager:
         icon: "plus"
         pos_hint: {"right": .95, "bottom": .05}
         elevation: 4
-        on_release: root.manager.current = 'import'
+        on_release: app.goto('import')
 
 <LibraryItem>:
     orientation: "horizontal"
@@ -459,12 +435,23 @@ ScreenManager:
         active: root.is_active
         pos_hint: {"center_y": .5}
         on_active: root.toggle_active(self.active)
+    MDIconButton:
+        icon: "file-export"
+        theme_text_color: "Hint"
+        pos_hint: {"center_y": .5}
+        on_release: app.open_export(root.lib_id, root.lib_name, int(root.word_count))
+    MDIconButton:
+        icon: "restart"
+        theme_text_color: "Hint"
+        pos_hint: {"center_y": .5}
+        on_release: root.reset_progress()
     MDIconButton:
         icon: "delete"
         theme_text_color: "Error"
         pos_hint: {"center_y": .5}
         on_release: root.delete_library()
-
+''',
+    'study': '''
 <StudyScreen>:
     name: 'study'
     on_enter: root.load_words()
@@ -481,7 +468,7 @@ ScreenManager:
                 icon: "arrow-left"
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 1
-                on_release: root.manager.current = 'home'
+                on_release: app.goto('home')
                 pos_hint: {"center_y": .5}
             MDLabel:
                 id: title_label
@@ -499,14 +486,62 @@ ScreenManager:
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 0.9
                 pos_hint: {"center_y": .5}
-        MDScrollView:
-            MDBoxLayout:
-                id: list_container
+        RecycleView:
+            id: study_list
+            viewclass: 'WordListItem'
+            do_scroll_x: False
+            RecycleBoxLayout:
                 orientation: 'vertical'
-                adaptive_height: True
+                default_size: None, dp(110)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
                 padding: dp(15)
                 spacing: dp(15)
 
+<WordListItem>:
+    orientation: "vertical"
+    size_hint_y: None
+    height: dp(110)
+    radius: [15]
+    elevation: 2
+    padding: dp(10)
+    ripple_behavior: False
+    md_bg_color: (1, 1, 1, 1) if app.theme_cls.theme_style == 'Light' else (0.2, 0.2, 0.2, 1)
+    canvas.before:
+        Color:
+            rgba: root.border_color
+        Line:
+            width: dp(2)
+            rounded_rectangle: self.x, self.y, self.width, self.height, dp(15)
+    MDBoxLayout:
+        orientation: "vertical"
+        MDLabel:
+            text: root.main_text
+            font_style: "H5"
+            bold: True
+            halign: "center"
+            theme_text_color: "Primary"
+            valign: "center"
+            size_hint_y: 0.6
+        MDLabel:
+            text: root.sub_text
+            font_style: "Subtitle1"
+            halign: "center"
+            theme_text_color: "Primary" if root.is_revealed else "Secondary"
+            opacity: 1 if root.is_revealed else 0
+            valign: "center"
+            size_hint_y: 0.4
+    MDSeparator:
+    MDLabel:
+        text: "← 熟知  |  模糊 →"
+        font_style: "Overline"
+        theme_text_color: "Hint"
+        halign: "center"
+        size_hint_y: None
+        height: dp(20)
+''',
+    'detail': '''
 <DetailScreen>:
     name: 'detail'
     on_enter: root.load_data()
@@ -523,7 +558,7 @@ ScreenManager:
                 icon: "arrow-left"
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 1
-                on_release: root.manager.current = 'home'
+                on_release: app.goto('home')
                 pos_hint: {"center_y": .5}
             MDLabel:
                 id: header_title
@@ -533,11 +568,16 @@ ScreenManager:
                 theme_text_color: "Custom"
                 text_color: 1, 1, 1, 1
                 pos_hint: {"center_y": .5}
-        MDScrollView:
-            MDBoxLayout:
-                id: detail_container
+        RecycleView:
+            id: detail_list
+            viewclass: 'SimpleWordItem'
+            on_scroll_y: root.on_list_scroll()
+            RecycleBoxLayout:
                 orientation: 'vertical'
-                adaptive_height: True
+                default_size: None, dp(80)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
                 padding: dp(15)
                 spacing: dp(10)
 
@@ -567,49 +607,155 @@ ScreenManager:
             icon: "refresh"
             on_release: root.reset_word()
             theme_text_color: "Hint"
+''',
+    'search': '''
+<SearchScreen>:
+    name: 'search'
+    MDBoxLayout:
+        orientation: 'vertical'
+        md_bg_color: app.theme_cls.bg_light
+        MDBoxLayout:
+            size_hint_y: None
+            height: dp(60)
+            padding: [dp(15), 0]
+            md_bg_color: app.theme_cls.primary_color
+            elevation: 4
+            MDIconButton:
+                icon: "arrow-left"
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 1
+                on_release: app.goto('home')
+                pos_hint: {"center_y": .5}
+            MDLabel:
+                text: "搜索单词"
+                font_style: "H6"
+                bold: True
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 1
+                pos_hint: {"center_y": .5}
+        MDBoxLayout:
+            size_hint_y: None
+            height: dp(80)
+            padding: [dp(15), dp(10)]
+            MDTextField:
+                id: query_input
+                hint_text: "输入英文前缀或中文"
+                mode: "rectangle"
+                on_text: root.on_query(self.text)
+        MDLabel:
+            id: result_hint
+            text: ""
+            halign: "center"
+            size_hint_y: None
+            height: dp(30) if self.text else 0
+            font_style: "Caption"
+            theme_text_color: "Secondary"
+        RecycleView:
+            id: result_list
+            viewclass: 'SearchResultItem'
+            on_scroll_y: root.on_list_scroll()
+            RecycleBoxLayout:
+                orientation: 'vertical'
+                default_size: None, dp(90)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
+                padding: dp(15)
+                spacing: dp(10)
 
-<WordListItem>:
+<SearchResultItem>:
     orientation: "vertical"
     size_hint_y: None
-    height: dp(110)
-    radius: [15]
-    elevation: 2
+    height: dp(90)
+    radius: [10]
+    elevation: 1
     padding: dp(10)
-    ripple_behavior: False
     md_bg_color: (1, 1, 1, 1) if app.theme_cls.theme_style == 'Light' else (0.2, 0.2, 0.2, 1)
-    canvas.before:
-        Color:
-            rgba: root.border_color
-        Line:
-            width: dp(2)
-            rounded_rectangle: self.x, self.y, self.width, self.height, dp(15)
-    MDBoxLayout:
-        orientation: "vertical"
-        MDLabel:
-            text: root.main_text
-            font_style: "H5"
-            bold: True
-            halign: "center"
-            theme_text_color: "Primary"
-            valign: "center"
-            size_hint_y: 0.6
-        MDLabel:
-            text: root.sub_text
-            font_style: "Subtitle1"
-            halign: "center"
-            theme_text_color: "Primary" if root.is_revealed else "Secondary"
-            opacity: 1 if root.is_revealed else 0
-            valign: "center"
-            size_hint_y: 0.4
-    MDSeparator:
     MDLabel:
-        text: "← 熟知  |  模糊 →"
-        font_style: "Overline"
+        text: root.en_text
+        font_style: "H6"
+        bold: True
+        theme_text_color: "Primary"
+    MDLabel:
+        text: root.cn_text
+        font_style: "Subtitle1"
+        theme_text_color: "Secondary"
+    MDLabel:
+        text: root.meta_text
+        font_style: "Caption"
         theme_text_color: "Hint"
-        halign: "center"
-        size_hint_y: None
-        height: dp(20)
-
+''',
+    'debug': '''
+<DebugScreen>:
+    name: 'debug'
+    MDBoxLayout:
+        orientation: 'vertical'
+        md_bg_color: app.theme_cls.bg_light
+        MDBoxLayout:
+            size_hint_y: None
+            height: dp(60)
+            padding: [dp(15), 0]
+            md_bg_color: app.theme_cls.primary_color
+            elevation: 4
+            MDIconButton:
+                icon: "arrow-left"
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 1
+                on_release: app.goto('home')
+                pos_hint: {"center_y": .5}
+            MDLabel:
+                text: "数据库调试"
+                font_style: "H6"
+                bold: True
+                theme_text_color: "Custom"
+                text_color: 1, 1, 1, 1
+                pos_hint: {"center_y": .5}
+        MDBoxLayout:
+            size_hint_y: None
+            height: dp(60)
+            padding: [dp(15), 0]
+            spacing: dp(10)
+            MDLabel:
+                text: "记录调用耗时"
+                theme_text_color: "Primary"
+                pos_hint: {"center_y": .5}
+            MDSwitch:
+                active: app.profiling
+                pos_hint: {"center_y": .5}
+                on_active: app.set_profiling(self.active)
+            MDTextField:
+                id: slow_input
+                hint_text: "慢查询阈值 ms"
+                input_filter: "float"
+                size_hint_x: 0.4
+                pos_hint: {"center_y": .5}
+                on_text_validate: root.set_slow_ms(self.text)
+        MDBoxLayout:
+            size_hint_y: None
+            height: dp(50)
+            padding: [dp(15), 0]
+            spacing: dp(10)
+            MDRaisedButton:
+                text: "刷新"
+                on_release: root.refresh()
+            MDFlatButton:
+                text: "清空"
+                on_release: root.clear()
+            MDFlatButton:
+                text: "导出 JSON"
+                on_release: root.export()
+        MDScrollView:
+            MDLabel:
+                id: report
+                text: ""
+                font_style: "Caption"
+                theme_text_color: "Primary"
+                size_hint_y: None
+                height: self.texture_size[1]
+                text_size: self.width, None
+                padding: [dp(15), dp(10)]
+''',
+    'import': '''
 <ImportScreen>:
     name: 'import'
     MDBoxLayout:
@@ -632,7 +778,7 @@ ScreenManager:
                 theme_text_color: "Custom"
                 text_color: app.theme_cls.primary_color
             MDLabel:
-                text: "选择 .xlsx 或 .csv 文件"
+                text: "选择 .xlsx、.csv 或 .wpk 文件"
                 halign: "center"
                 font_style: "H6"
                 theme_text_color: "Primary"
@@ -649,6 +795,11 @@ ScreenManager:
                 halign: "center"
                 font_style: "Caption"
                 theme_text_color: "Secondary"
+            MDTextField:
+                id: columns_field
+                hint_text: "英文列,中文列（如 A,B，留空自动判断）"
+                pos_hint: {"center_x": .5}
+                size_hint_x: 0.7
             MDRaisedButton:
                 id: btn_import
                 text: "确认导入"
@@ -658,10 +809,169 @@ ScreenManager:
                 disabled: True
                 on_release: root.process_import()
                 md_bg_color: app.theme_cls.accent_color
-            Widget: 
-'''
+            MDProgressBar:
+                id: progress_bar
+                value: 0
+                size_hint_y: None
+                height: dp(4)
+                opacity: 0
+            MDLabel:
+                id: progress_label
+                text: ""
+                halign: "center"
+                font_style: "Caption"
+                theme_text_color: "Secondary"
+            MDFlatButton:
+                id: btn_cancel
+                text: "取消导入"
+                pos_hint: {"center_x": .5}
+                opacity: 0
+                disabled: True
+                on_release: root.cancel_import()
+            Widget:
+''',
+    'export': '''
+<ExportScreen>:
+    name: 'export'
+    on_enter: root.show_target()
+    MDBoxLayout:
+        orientation: 'vertical'
+        md_bg_color: app.theme_cls.bg_light
+        MDTopAppBar:
+            title: "导出词库"
+            left_action_items: [["arrow-left", lambda x: root.go_back()]]
+            elevation: 0
+            md_bg_color: app.theme_cls.primary_color
+        MDBoxLayout:
+            orientation: 'vertical'
+            padding: dp(30)
+            spacing: dp(30)
+            Widget:
+            MDIcon:
+                icon: "file-download"
+                halign: "center"
+                font_size: "100sp"
+                theme_text_color: "Custom"
+                text_color: app.theme_cls.primary_color
+            MDLabel:
+                id: target_label
+                text: ""
+                halign: "center"
+                font_style: "H6"
+                theme_text_color: "Primary"
+            MDLabel:
+                text: "导出的文件包含学习进度，可在【导入词库】中原样导回"
+                halign: "center"
+                font_style: "Caption"
+                theme_text_color: "Secondary"
+            MDFillRoundFlatIconButton:
+                id: btn_csv
+                icon: "file-delimited"
+                text: "导出为 CSV"
+                pos_hint: {"center_x": .5}
+                size_hint_x: 0.7
+                padding: dp(15)
+                on_release: root.process_export('.csv')
+            MDFillRoundFlatIconButton:
+                id: btn_xlsx
+                icon: "file-excel"
+                text: "导出为 Excel"
+                pos_hint: {"center_x": .5}
+                size_hint_x: 0.7
+                padding: dp(15)
+                on_release: root.process_export('.xlsx')
+            MDProgressBar:
+                id: progress_bar
+                value: 0
+                size_hint_y: None
+                height: dp(4)
+                opacity: 0
+            MDLabel:
+                id: progress_label
+                text: ""
+                halign: "center"
+                font_style: "Caption"
+                theme_text_color: "Secondary"
+            MDFlatButton:
+                id: btn_cancel
+                text: "取消导出"
+                pos_hint: {"center_x": .5}
+                opacity: 0
+                disabled: True
+                on_release: root.cancel_export()
+            Widget:
+''',
+    'sync': '''
+<SyncScreen>:
+    name: 'sync'
+    MDBoxLayout:
+        orientation: 'vertical'
+        md_bg_color: app.theme_cls.bg_light
+        MDTopAppBar:
+            title: "进度同步"
+            left_action_items: [["arrow-left", lambda x: app.goto('library')]]
+            elevation: 0
+            md_bg_color: app.theme_cls.primary_color
+        MDBoxLayout:
+            orientation: 'vertical'
+            padding: dp(30)
+            spacing: dp(30)
+            Widget:
+            MDIcon:
+                icon: "sync"
+                halign: "center"
+                font_size: "100sp"
+                theme_text_color: "Custom"
+                text_color: app.theme_cls.primary_color
+            MDLabel:
+                text: "学习者：" + app.profile_name
+                halign: "center"
+                font_style: "H6"
+                theme_text_color: "Primary"
+            MDLabel:
+                text: "在一台设备导出同步文件，拷到另一台设备导入合并；\\n只包含上次导出以来的进度改动，两边都改过的单词以后改的为准"
+                halign: "center"
+                font_style: "Caption"
+                theme_text_color: "Secondary"
+            MDFillRoundFlatIconButton:
+                id: btn_export
+                icon: "upload"
+                text: "导出同步文件"
+                pos_hint: {"center_x": .5}
+                size_hint_x: 0.7
+                padding: dp(15)
+                on_release: root.export_changes(False)
+            MDFillRoundFlatIconButton:
+                id: btn_import
+                icon: "download"
+                text: "导入同步文件"
+                pos_hint: {"center_x": .5}
+                size_hint_x: 0.7
+                padding: dp(15)
+                on_release: root.file_manager_open()
+            MDFlatButton:
+                id: btn_full
+                text: "导出全部进度（对方漏导入文件时用）"
+                pos_hint: {"center_x": .5}
+                on_release: root.export_changes(True)
+            MDLabel:
+                id: status_label
+                text: ""
+                halign: "center"
+                font_style: "Caption"
+                theme_text_color: "Secondary"
+            Widget:
+''',
+}
 
-# --- 7. 组件逻辑 ---
+LOADED_KV = set()
+
+def load_kv(name):
+    if name not in LOADED_KV:
+        Builder.load_string(LAZY_KV[name])
+        LOADED_KV.add(name)
+
+# --- 8. 组件逻辑 ---
 
 class TutorialDialogContent(MDBoxLayout):
     pass
@@ -673,50 +983,60 @@ class LibraryItem(MDCard):
     word_count = StringProperty("0")
     def __init__(self, lib_data, parent_screen, **kwargs):
         super().__init__(**kwargs)
+        self.parent_screen = parent_screen
+        self.update_data(lib_data)
+    def update_data(self, lib_data):
+        # Kivy 属性值不变时不会触发重绘，重复赋值没有代价
         self.lib_id = lib_data[0]
         self.lib_name = str(lib_data[1])
         self.is_active = True if lib_data[2] == 1 else False
         self.word_count = str(lib_data[3])
-        self.parent_screen = parent_screen
     def toggle_active(self, value):
-        db.toggle_library_status(self.lib_id, value)
+        # 刷新列表时同步开关状态也会触发 on_active，值未变就不写库
+        if bool(value) == self.is_active: return
+        self.is_active = bool(value)
+        db.call('toggle_library_status', self.lib_id, value)
+    def reset_progress(self):
+        db.call('reset_library_progress', self.lib_id, callback=lambda r: MDApp.get_running_app().run_chunks('clean_stale_progress'))
+        show_toast("该词库进度已重置")
     def delete_library(self):
-        db.delete_library(self.lib_id)
-        self.parent_screen.load_libraries()
+        db.call('delete_library', self.lib_id, callback=lambda r: MDApp.get_running_app().run_chunks('purge_deleted_libraries'))
+        self.parent_screen.remove_library(self.lib_id)
         show_toast("词库已删除")
 
+class SearchResultItem(MDCard):
+    # SearchScreen 列表的复用视图
+    en_text = StringProperty("")
+    cn_text = StringProperty("")
+    meta_text = StringProperty("")
+
 class SimpleWordItem(MDCard):
+    # DetailScreen 列表的复用视图，属性由 RecycleView 按 data 中的字典赋值
+    word_id = NumericProperty(0)
     en_text = StringProperty("")
     cn_text = StringProperty("")
-    def __init__(self, word_data, **kwargs):
-        super().__init__(**kwargs)
-        self.word_data = word_data
-        self.en_text = word_data['en']
-        self.cn_text = word_data['cn']
     def reset_word(self):
-        db.update_status(self.word_data['id'], 0)
+        db.call('reset_word', self.word_id)
         show_toast("已重置为新词")
-        if self.parent: self.parent.remove_widget(self)
+        MDApp.get_running_app().root.get_screen('detail').remove_word(self.word_id)
 
-class WordListItem(MDCard):
+class WordListItem(RecycleDataViewBehavior, MDCard):
+    # StudyScreen 列表的复用卡片：只创建填满屏幕所需的数量，滚动时由 RecycleView 重新绑定单词数据；
+    # 翻面状态存回 data，卡片被复用到别的单词时不会串
+    word_id = NumericProperty(0)
     main_text = StringProperty("")
     sub_text = StringProperty("")
     is_revealed = BooleanProperty(False)
     border_color = ListProperty([0, 0, 0, 0])
-    def __init__(self, word_data, parent_list, study_screen, **kwargs):
-        super().__init__(**kwargs)
-        self.word_data = word_data
-        self.parent_list = parent_list
-        self.study_screen = study_screen
-        self.touch_start_pos = (0, 0)
-        app = MDApp.get_running_app()
-        if app.view_mode == 'en_to_cn':
-            self.main_text = word_data['en']
-            self.sub_text = word_data['cn']
-        else:
-            self.main_text = word_data['cn']
-            self.sub_text = word_data['en']
-        if word_data['status'] == 1: self.border_color = [1, 0.6, 0, 0.5]
+    index = None
+    swiped = False
+    touch_start_pos = (0, 0)
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        Animation.cancel_all(self)
+        self.opacity = 1
+        self.swiped = False
+        return super().refresh_view_attrs(rv, index, data)
     def on_touch_down(self, touch):
         if self.collide_point(*touch.pos): self.touch_start_pos = touch.pos
         return super().on_touch_down(touch)
@@ -730,41 +1050,176 @@ class WordListItem(MDCard):
                 return True
             elif abs(dx) < 30 and abs(dy) < 30:
                 self.is_revealed = not self.is_revealed
+                self.study_screen.set_revealed(self.index, self.is_revealed)
                 return True
         return super().on_touch_up(touch)
+    @property
+    def study_screen(self):
+        return MDApp.get_running_app().root.get_screen('study')
     def handle_swipe(self, direction):
-        anim = Animation(opacity=0, height=0, duration=0.3)
-        anim.bind(on_complete=self.remove_self)
-        anim.start(self)
-        if direction == 'left': db.update_status(self.word_data['id'], 2)
-        else: db.update_status(self.word_data['id'], 1)
-    def remove_self(self, *args):
-        if self.parent:
-            self.parent.remove_widget(self)
-            self.study_screen.update_progress()
-
-# --- 8. 屏幕逻辑 ---
+        if self.swiped: return
+        self.swiped = True
+        word_id = self.word_id
+        Animation(opacity=0, duration=0.3).start(self)
+        # 移除按单词 id 计时进行，不依赖这张卡片：动画途中卡片被复用也不会漏掉
+        Clock.schedule_once(lambda dt: self.study_screen.remove_word(word_id), 0.3)
+        grade = scheduler.GRADE_KNOWN if direction == 'left' else scheduler.GRADE_FUZZY
+        db.call('grade_word', word_id, grade)
+
+class ImportCancelled(Exception):
+    pass
+
+class ImportJob(threading.Thread):
+    # 后台导入：工作线程用独立连接读文件、写库，进度与结果经 Clock.schedule_once 交回 UI 线程；
+    # columns 为用户指定的 (英文列, 中文列)，为空时自动判断
+    def __init__(self, path, on_progress, on_done, columns=None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.columns = columns
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.cancel_event = threading.Event()
+        self.parsed = 0
+        self.fraction = 0.0
+    def cancel(self):
+        self.cancel_event.set()
+    def set_fraction(self, fraction):
+        self.fraction = fraction
+    def count_rows(self, rows):
+        for row in rows:
+            if self.cancel_event.is_set(): raise ImportCancelled()
+            self.parsed += 1
+            yield row
+    def report(self, inserted, skipped):
+        if self.cancel_event.is_set(): raise ImportCancelled()
+        args = (self.parsed, inserted, skipped, self.fraction)
+        Clock.schedule_once(lambda dt: self.on_progress(*args))
+    def run(self):
+        lib_name = os.path.splitext(os.path.basename(self.path))[0]
+        result = ('error', lib_name, 0, 0, '')
+        worker_db, lib_ids = None, []
+        try:
+            worker_db = DatabaseManager(db.db_name, db.progress_name)
+            if profiler.enabled: profiler.attach(worker_db)
+            if self.path.lower().endswith(PACK_EXT): lib_name, inserted, skipped = self.import_pack(worker_db, lib_ids)
+            else: lib_name, inserted, skipped = self.import_table(worker_db, lib_name, lib_ids)
+            result = ('done', lib_name, inserted, skipped, '')
+        except ImportCancelled:
+            # 已提交的块随词库一起删掉（删除是墓碑，单词清理交给后台分块任务）
+            for lib_id in lib_ids: worker_db.delete_library(lib_id)
+            result = ('cancelled', lib_name, 0, 0, '')
+        except Exception as e:
+            for lib_id in lib_ids: worker_db.delete_library(lib_id)
+            result = ('error', lib_name, 0, 0, str(e))
+        finally:
+            if worker_db: worker_db.conn.close()
+            Clock.schedule_once(lambda dt: self.on_done(*result))
+    def import_table(self, worker_db, lib_name, lib_ids):
+        # 读取 -> 解析 -> 分块写库 全程是生成器流水线，内存只与块大小有关
+        rows = self.count_rows(iter_rows(self.path, on_progress=self.set_fraction))
+        head = list(itertools.islice(rows, 1))
+        rows = itertools.chain(head, rows)
+        if head and is_export_header(head[0]): return self.import_export(worker_db, rows, lib_ids)
+        lib_ids.append(worker_db.add_library(lib_name))
+        inserted, skipped = worker_db.bulk_add_words(iter_word_pairs(rows, self.columns), lib_ids[0], on_chunk=self.report)
+        return lib_name, inserted, skipped
+    def import_pack(self, worker_db, lib_ids):
+        # 词库包：mmap 打开后直接按偏移取字符串写库，不经过表格解析和中英文列判断
+        with WordPack(self.path) as pack:
+            lib_name = pack.name or os.path.splitext(os.path.basename(self.path))[0]
+            lib_ids.append(worker_db.add_library(lib_name))
+            words = self.count_rows(pack.iter_words(on_progress=self.set_fraction))
+            inserted, skipped = worker_db.bulk_add_words(words, lib_ids[0], on_chunk=self.report)
+        return lib_name, inserted, skipped
+    def import_export(self, worker_db, rows, lib_ids):
+        # 本应用导出的文件：按词库列还原成一个或多个词库，连同进度一起写入
+        inserted, skipped, names = 0, 0, []
+        for name, records in itertools.groupby(iter_export_records(rows, self.path.lower().endswith('.csv')), key=lambda r: r[0]):
+            lib_ids.append(worker_db.add_library(name))
+            names.append(name)
+            report = lambda i, s: self.report(inserted + i, skipped + s)
+            i, s = worker_db.bulk_add_words((r[1:] for r in records), lib_ids[-1], on_chunk=report)
+            inserted, skipped = inserted + i, skipped + s
+        if not names: return os.path.splitext(os.path.basename(self.path))[0], 0, 0
+        return (names[0] if len(names) == 1 else f"{names[0]} 等 {len(names)} 个词库"), inserted, skipped
+
+class ExportCancelled(Exception):
+    pass
+
+class ExportJob(threading.Thread):
+    # 后台导出：先等写线程把缓存的进度落盘，再用独立连接分块读库、边读边写文件，进度经 Clock.schedule_once 交回 UI 线程
+    def __init__(self, path, library_id, barrier, on_progress, on_done):
+        super().__init__(daemon=True)
+        self.path = path
+        self.library_id = library_id
+        self.barrier = barrier
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.cancel_event = threading.Event()
+    def cancel(self):
+        self.cancel_event.set()
+    def check_rows(self, rows):
+        for row in rows:
+            if self.cancel_event.is_set(): raise ExportCancelled()
+            yield row
+    def report(self, count):
+        Clock.schedule_once(lambda dt: self.on_progress(count))
+    def run(self):
+        result = ('error', 0, '')
+        worker_db = None
+        try:
+            self.barrier.result()
+            worker_db = DatabaseManager(db.db_name, db.progress_name)
+            if profiler.enabled: profiler.attach(worker_db)
+            rows = self.check_rows(worker_db.iter_export_rows(self.library_id))
+            result = ('done', export_words(self.path, rows, on_progress=self.report), '')
+        except ExportCancelled:
+            result = ('cancelled', 0, '')
+        except Exception as e:
+            result = ('error', 0, str(e))
+        finally:
+            if worker_db: worker_db.conn.close()
+            Clock.schedule_once(lambda dt: self.on_done(*result))
+
+# --- 9. 屏幕逻辑 ---
 
 class HomeScreen(Screen):
+    # 连点标题 DEBUG_TAPS 次（每两次间隔不超过 1 秒）进入隐藏的调试界面
+    DEBUG_TAPS = 5
     dialog = None
     tutorial_dialog = None
     tutorial_content = None
+    profile_dialog = None
+    title_taps = 0
+    last_title_tap = 0
+    def on_title_tap(self):
+        now = time.monotonic()
+        self.title_taps = self.title_taps + 1 if now - self.last_title_tap < 1 else 1
+        self.last_title_tap = now
+        if self.title_taps >= self.DEBUG_TAPS:
+            self.title_taps = 0
+            MDApp.get_running_app().goto('debug')
     def update_stats(self):
-        stats = db.get_stats()
-        total = db.get_total_count()
+        db.read(lambda d: (d.get_stats(), d.get_total_count()), callback=self.show_stats)
+    def show_stats(self, result):
+        stats, total = result
         self.ids.stat_mastered.text = str(stats['mastered'])
         self.ids.stat_review.text = str(stats['review'])
         self.ids.progress_text.text = f"已掌握: {stats['mastered']}  /  总词数: {total}"
     def check_and_start_study(self):
-        total = db.get_total_count()
+        db.read(lambda d: (d.get_total_count(), d.get_setting('tutorial_seen')), callback=self.on_study_checked)
+    def on_study_checked(self, result):
+        total, seen = result
         if total == 0:
             show_toast("请先在【词库管理】中添加词库")
             return
-        seen = db.get_setting('tutorial_seen')
         if seen == '1': self.start_study_logic()
         else: self.show_tutorial_dialog()
     def show_tutorial_dialog(self):
         if not self.tutorial_dialog:
+            from kivymd.uix.dialog import MDDialog
+            from kivymd.uix.button import MDFlatButton
+            load_kv('tutorial')
             self.tutorial_content = TutorialDialogContent()
             app = MDApp.get_running_app()
             self.tutorial_dialog = MDDialog(
@@ -776,7 +1231,7 @@ class HomeScreen(Screen):
         self.tutorial_dialog.open()
     def on_tutorial_confirm(self, *args):
         if self.tutorial_content.ids.checkbox.active:
-            db.set_setting('tutorial_seen', '1')
+            db.call('set_setting', 'tutorial_seen', '1')
         self.tutorial_dialog.dismiss()
         self.start_study_logic()
     def start_study_logic(self):
@@ -786,13 +1241,15 @@ class HomeScreen(Screen):
         except: count = 20
         app = MDApp.get_running_app()
         app.batch_limit = count
-        self.manager.current = 'study'
+        app.goto('study')
     def open_detail_view(self, type_str):
         app = MDApp.get_running_app()
         app.detail_view_type = type_str
-        self.manager.current = 'detail'
+        app.goto('detail')
     def show_reset_dialog(self):
         if not self.dialog:
+            from kivymd.uix.dialog import MDDialog
+            from kivymd.uix.button import MDFlatButton
             self.dialog = MDDialog(
                 title="⚠️ 确认重置?",
                 text="这会清除所有记忆进度，并重置新手引导。\n此操作不可撤销。",
@@ -802,147 +1259,539 @@ class HomeScreen(Screen):
                 ],
             )
         self.dialog.open()
+    def show_profile_dialog(self):
+        db.call('get_profiles', callback=self.open_profile_dialog)
+    def open_profile_dialog(self, profiles):
+        # 学习者列表每次打开时重建；点名字切换，右侧删除（当前学习者不能删）
+        from kivymd.uix.dialog import MDDialog
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.list import OneLineAvatarIconListItem, IconLeftWidget, IconRightWidget
+        app = MDApp.get_running_app()
+        items = []
+        for profile_id, name in profiles:
+            item = OneLineAvatarIconListItem(text=name, on_release=lambda x, p=profile_id: self.on_profile_selected(p))
+            item.add_widget(IconLeftWidget(icon="account-check" if profile_id == app.profile_id else "account"))
+            if profile_id != app.profile_id:
+                item.add_widget(IconRightWidget(icon="delete", on_release=lambda x, p=profile_id: self.delete_profile(p)))
+            items.append(item)
+        self.profile_dialog = MDDialog(
+            title="切换学习者",
+            type="simple",
+            items=items,
+            buttons=[MDFlatButton(text="新建学习者", text_color=app.theme_cls.primary_color, on_release=self.show_new_profile_dialog)],
+        )
+        self.profile_dialog.open()
+    def on_profile_selected(self, profile_id):
+        self.profile_dialog.dismiss()
+        MDApp.get_running_app().switch_profile(profile_id)
+    def delete_profile(self, profile_id):
+        self.profile_dialog.dismiss()
+        db.call('delete_profile', profile_id, callback=lambda r: show_toast("学习者已删除"))
+    def show_new_profile_dialog(self, *args):
+        from kivymd.uix.dialog import MDDialog
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.textfield import MDTextField
+        self.profile_dialog.dismiss()
+        field = MDTextField(hint_text="学习者名字")
+        dialog = MDDialog(
+            title="新建学习者",
+            type="custom",
+            content_cls=field,
+            buttons=[
+                MDFlatButton(text="取消", on_release=lambda x: dialog.dismiss()),
+                MDFlatButton(text="创建并切换", on_release=lambda x: (dialog.dismiss(), self.add_profile(field.text.strip()))),
+            ],
+        )
+        dialog.open()
+    def add_profile(self, name):
+        if not name:
+            show_toast("请输入名字")
+            return
+        db.call('add_profile', name, callback=MDApp.get_running_app().switch_profile)
     def execute_reset(self, *args):
-        db.reset_progress()
         self.dialog.dismiss()
+        db.call('reset_progress', callback=self.on_reset_done)
+    def on_reset_done(self, result):
+        MDApp.get_running_app().run_chunks('clean_stale_progress')
         self.update_stats()
         show_toast("进度已全部重置！")
 
 class LibraryScreen(Screen):
+    # 词库卡片按 id 常驻复用：刷新时与上次的结果比对，只增删变化的卡片、更新变化的字段；
+    # 词数来自触发器维护的 word_counts，查询只涉及 O(词库数) 行
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.items = {}
     def load_libraries(self):
+        db.call('get_libraries', callback=self.show_libraries)
+    def show_libraries(self, libs):
         container = self.ids.lib_container
-        container.clear_widgets()
-        libs = db.get_libraries()
-        if not libs:
-            show_toast("暂无词库，请点击右下角添加")
-            return
+        current = {lib[0] for lib in libs}
+        for lib_id in [i for i in self.items if i not in current]:
+            container.remove_widget(self.items.pop(lib_id))
         for lib in libs:
-            item = LibraryItem(lib_data=lib, parent_screen=self)
-            container.add_widget(item)
+            item = self.items.get(lib[0])
+            if item: item.update_data(lib)
+            else:
+                # get_libraries 按 id 升序，新词库 id 最大，追加到末尾即保持顺序
+                item = LibraryItem(lib_data=lib, parent_screen=self)
+                self.items[lib[0]] = item
+                container.add_widget(item)
+        if not libs: show_toast("暂无词库，请点击右下角添加")
+    def remove_library(self, lib_id):
+        item = self.items.pop(lib_id, None)
+        if item: self.ids.lib_container.remove_widget(item)
+    def export_all(self):
+        if not self.items:
+            show_toast("暂无词库可导出")
+            return
+        total = sum(int(item.word_count) for item in self.items.values())
+        MDApp.get_running_app().open_export(None, "全部词库", total)
 
 class ImportScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.file_manager = MDFileManager(
-            exit_manager=self.exit_manager,
-            select_path=self.select_path,
-            preview=False,
-        )
+        self.file_manager = None
         self.current_path = ""
+        self.job = None
     def file_manager_open(self):
+        if not self.file_manager:
+            from kivymd.uix.filemanager import MDFileManager
+            self.file_manager = MDFileManager(
+                exit_manager=self.exit_manager,
+                select_path=self.select_path,
+                preview=False,
+            )
         self.file_manager.show(os.path.expanduser("~"))
     def select_path(self, path):
         self.exit_manager()
-        if path.endswith(('.xlsx', '.xls', '.csv')):
+        if path.lower().endswith(('.xlsx', '.xls', '.csv', PACK_EXT)):
             self.current_path = path
             self.ids.selected_path.text = os.path.basename(path)
             self.ids.btn_import.disabled = False
-        else: show_toast("请选择 Excel 或 CSV 文件")
+        else: show_toast("请选择 Excel、CSV 或词库包 (.wpk) 文件")
     def exit_manager(self, *args):
-        self.file_manager.close()
+        if self.file_manager: self.file_manager.close()
     def process_import(self):
+        if self.job: return
         try:
-            # 使用纯Python库读取，移除Pandas依赖
-            from openpyxl import load_workbook
-            import xlrd
-
-            rows_data = []
-            path = self.current_path
-            filename = os.path.basename(path)
-            lib_name = os.path.splitext(filename)[0]
-            lib_id = db.add_library(lib_name)
-
-            if path.endswith('.csv'):
-                try:
-                    with open(path, 'r', encoding='utf-8-sig') as f:
-                        reader = csv.reader(f)
-                        rows_data = list(reader)
-                except UnicodeDecodeError:
-                    with open(path, 'r', encoding='gbk') as f:
-                        reader = csv.reader(f)
-                        rows_data = list(reader)
-            elif path.endswith('.xlsx'):
-                wb = load_workbook(path, data_only=True)
-                ws = wb.active
-                for row in ws.iter_rows(values_only=True):
-                    rows_data.append(row)
-            elif path.endswith('.xls'):
-                book = xlrd.open_workbook(path)
-                sheet = book.sheet_by_index(0)
-                for rx in range(sheet.nrows):
-                    rows_data.append(sheet.row_values(rx))
-
-            count = 0
-            for row in rows_data:
-                vals = [str(v).strip() for v in row if v is not None and str(v).strip() != ""]
-                if len(vals) < 2: continue
-                cn, en = "", ""
-                for v in vals:
-                    if re.search(r'[\u4e00-\u9fa5]', v): cn = v
-                    else: en = v
-                if cn and en:
-                    db.add_word(en, cn, lib_id)
-                    count += 1
-
-            show_toast(f"成功导入: {lib_name} ({count}词)")
-            self.manager.current = 'library'
-        except Exception as e:
-            show_toast(f"导入失败: {str(e)}")
+            columns = parse_columns(self.ids.columns_field.text)
+        except ValueError as e:
+            show_toast(str(e))
+            return
+        self.job = ImportJob(self.current_path, self.on_import_progress, self.on_import_done, columns)
+        self.set_importing(True)
+        self.job.start()
+    def set_importing(self, busy):
+        self.ids.btn_import.disabled = busy
+        self.ids.btn_cancel.disabled = not busy
+        self.ids.btn_cancel.opacity = 1 if busy else 0
+        self.ids.progress_bar.opacity = 1 if busy else 0
+        self.ids.progress_bar.value = 0
+        self.ids.progress_label.text = "正在导入..." if busy else ""
+    def on_import_progress(self, parsed, inserted, skipped, fraction):
+        self.ids.progress_bar.value = fraction * 100
+        self.ids.progress_label.text = f"已读取 {parsed} 行  ·  导入 {inserted}  ·  跳过 {skipped}"
+    def cancel_import(self):
+        if self.job:
+            self.job.cancel()
+            self.ids.progress_label.text = "正在取消..."
+    def on_import_done(self, state, lib_name, inserted, skipped, error):
+        self.job = None
+        self.set_importing(False)
+        if state == 'done':
+            msg = f"成功导入: {lib_name} ({inserted}词)"
+            if skipped: msg += f"，跳过重复 {skipped}"
+            show_toast(msg)
+            MDApp.get_running_app().goto('library')
+        else:
+            # 取消或失败时建好的词库已打上删除标记，交给后台清理
+            MDApp.get_running_app().run_chunks('purge_deleted_libraries')
+            if state == 'cancelled': show_toast("已取消导入")
+            else: show_toast(f"导入失败: {error}")
     def go_back(self):
-        self.manager.current = 'library'
+        if self.job:
+            show_toast("正在导入，请先取消")
+            return
+        MDApp.get_running_app().goto('library')
+
+class ExportScreen(Screen):
+    # 导出 app.export_target 指定的词库（library_id 为空时导出全部），文件写到导入时文件浏览器打开的目录
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.job = None
+        self.total = 0
+    def show_target(self):
+        if self.job: return
+        library_id, name, total = MDApp.get_running_app().export_target
+        self.total = total
+        self.ids.target_label.text = f"{name}（{total} 词）"
+        self.set_exporting(False)
+    def process_export(self, ext):
+        if self.job: return
+        library_id, name, total = MDApp.get_running_app().export_target
+        safe = re.sub(r'[\\/:*?"<>|]', '_', name).strip() or '词库'
+        path = os.path.join(os.path.expanduser("~"), time.strftime(f"{safe}_%Y%m%d_%H%M%S{ext}"))
+        self.job = ExportJob(path, library_id, db.flush(), self.on_export_progress, lambda *r: self.on_export_done(path, *r))
+        self.set_exporting(True)
+        self.job.start()
+    def set_exporting(self, busy):
+        for button in (self.ids.btn_csv, self.ids.btn_xlsx): button.disabled = busy
+        self.ids.btn_cancel.disabled = not busy
+        self.ids.btn_cancel.opacity = 1 if busy else 0
+        self.ids.progress_bar.opacity = 1 if busy else 0
+        self.ids.progress_bar.value = 0
+        self.ids.progress_label.text = "正在导出..." if busy else ""
+    def on_export_progress(self, count):
+        self.ids.progress_bar.value = count * 100 / self.total if self.total else 0
+        self.ids.progress_label.text = f"已导出 {count} / {self.total} 词"
+    def cancel_export(self):
+        if self.job:
+            self.job.cancel()
+            self.ids.progress_label.text = "正在取消..."
+    def on_export_done(self, path, state, count, error):
+        self.job = None
+        self.set_exporting(False)
+        if state == 'done': show_toast(f"已导出 {count} 词: {path}")
+        elif state == 'cancelled': show_toast("已取消导出")
+        else: show_toast(f"导出失败: {error}")
+    def go_back(self):
+        if self.job:
+            show_toast("正在导出，请先取消")
+            return
+        MDApp.get_running_app().goto('library')
+
+class SyncScreen(Screen):
+    # 同步文件很小，读写和合并都直接排在数据库写线程上，busy 期间按钮禁用
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.file_manager = None
+    def set_busy(self, busy, text=""):
+        for button in (self.ids.btn_export, self.ids.btn_import, self.ids.btn_full): button.disabled = busy
+        self.ids.status_label.text = text
+    def export_changes(self, full):
+        app = MDApp.get_running_app()
+        safe = re.sub(r'[\\/:*?"<>|]', '_', app.profile_name).strip() or '学习者'
+        path = os.path.join(os.path.expanduser("~"), time.strftime(f"{safe}_同步_%Y%m%d_%H%M%S{SYNC_EXT}"))
+        self.set_busy(True, "正在导出...")
+        db.write(lambda d: export_changes(d, path, full), callback=lambda count: self.on_exported(path, count), on_error=self.on_failed)
+    def on_exported(self, path, count):
+        if not count:
+            self.set_busy(False, "没有新的改动")
+            return
+        self.set_busy(False, f"已导出 {count} 条改动: {path}")
+        show_toast(f"已导出 {count} 条改动")
+    def file_manager_open(self):
+        if not self.file_manager:
+            from kivymd.uix.filemanager import MDFileManager
+            self.file_manager = MDFileManager(exit_manager=self.exit_manager, select_path=self.select_path, preview=False)
+        self.file_manager.show(os.path.expanduser("~"))
+    def exit_manager(self, *args):
+        if self.file_manager: self.file_manager.close()
+    def select_path(self, path):
+        self.exit_manager()
+        if not path.lower().endswith(SYNC_EXT):
+            show_toast(f"请选择同步文件 ({SYNC_EXT})")
+            return
+        self.set_busy(True, "正在合并...")
+        db.write(lambda d: import_changes(d, path), callback=self.on_imported, on_error=self.on_failed)
+    def on_imported(self, result):
+        applied, skipped, gap = result
+        text = f"合并 {applied} 条改动"
+        if skipped: text += f"，跳过本机没有的单词 {skipped} 条"
+        if gap: text += "\n对方有之前的同步文件没有导入，请让对方导出全部进度"
+        self.set_busy(False, text)
+        show_toast(f"已合并 {applied} 条改动")
+        # 合并进来的词库重置会留下过期行
+        MDApp.get_running_app().run_chunks('clean_stale_progress')
+    def on_failed(self, error):
+        self.set_busy(False)
+        show_toast(f"同步失败: {error}")
+
+class PagedListScreen(Screen):
+    # 列表只为可见区域创建卡片；数据按页键集查询，滚到距底部不足两屏时加载下一页。
+    # 每页在数据库线程上查询，同一时间只有一个在途请求；generation 用来丢弃切换列表前发出的旧结果。
+    # 子类指定 list_id，实现 fetch_page(last_id, callback, on_error) 与 item_data(row)
+    PAGE_SIZE = 50
+    list_id = ''
+    last_id = None
+    exhausted = False
+    loading = False
+    generation = 0
+    @property
+    def rv(self):
+        return self.ids[self.list_id]
+    def reset_list(self):
+        rv = self.rv
+        rv.data = []
+        rv.scroll_y = 1
+        self.last_id, self.exhausted, self.loading = None, False, False
+        self.generation += 1
+        return self.generation
+    def load_page(self):
+        if self.exhausted or self.loading: return
+        self.loading = True
+        generation = self.generation
+        self.fetch_page(self.last_id, lambda rows: self.on_page(generation, rows), lambda e: self.on_page_failed(generation, e))
+    def on_page_failed(self, generation, error):
+        # 查询失败时放开在途标记，之后滚动还能重新加载这一页
+        if generation != self.generation: return
+        self.loading = False
+        Logger.warning(f"List: page fetch failed ({error})")
+        show_toast("加载失败，请稍后重试")
+    def on_page(self, generation, rows):
+        if generation != self.generation: return
+        self.loading = False
+        if len(rows) < self.PAGE_SIZE: self.exhausted = True
+        if not rows:
+            if self.last_id is None: self.on_empty()
+            return
+        self.last_id = rows[-1]['id']
+        rv = self.rv
+        # 追加数据会改变内容高度，记下距顶部的像素位置，布局更新后还原，避免列表跳动
+        offset = (1 - rv.scroll_y) * self.scrollable_height()
+        rv.data.extend(self.item_data(row) for row in rows)
+        if offset > 0: Clock.schedule_once(lambda dt: self.restore_offset(offset))
+    def on_empty(self):
+        pass
+    def scrollable_height(self):
+        rv = self.rv
+        return max(rv.layout_manager.height - rv.height, 0)
+    def restore_offset(self, offset):
+        scrollable = self.scrollable_height()
+        if scrollable > 0: self.rv.scroll_y = max(0, 1 - offset / scrollable)
+    def on_list_scroll(self):
+        rv = self.rv
+        if not self.exhausted and rv.scroll_y * self.scrollable_height() < rv.height * 2: self.load_page()
 
-class DetailScreen(Screen):
+class DetailScreen(PagedListScreen):
+    list_id = 'detail_list'
+    status_code = 1
     def load_data(self):
-        container = self.ids.detail_container
-        container.clear_widgets()
         app = MDApp.get_running_app()
         view_type = app.detail_view_type 
-        status_code = 1 if view_type == 'review' else 2
-        self.ids.header_title.text = "待复习列表" if view_type == 'review' else "已掌握列表"
-        words = db.get_all_words_by_status(status_code)
-        if not words:
-            show_toast("列表为空")
-            return
-        for word in words[:200]:
-            item = SimpleWordItem(word_data=word)
-            container.add_widget(item)
-        if len(words) > 200: show_toast(f"仅显示前 200 个 (共 {len(words)} 个)")
+        self.status_code = 1 if view_type == 'review' else 2
+        title = "待复习列表" if view_type == 'review' else "已掌握列表"
+        self.ids.header_title.text = title
+        generation = self.reset_list()
+        db.call('count_by_status', self.status_code, callback=lambda n: self.show_count(generation, title, n))
+        self.load_page()
+    def show_count(self, generation, title, count):
+        if generation == self.generation: self.ids.header_title.text = f"{title} ({count})"
+    def fetch_page(self, last_id, callback, on_error):
+        db.call('get_words_page', self.status_code, before_id=last_id, limit=self.PAGE_SIZE, callback=callback, on_error=on_error)
+    def item_data(self, w):
+        return {'word_id': w['id'], 'en_text': w['en'], 'cn_text': w['cn']}
+    def on_empty(self):
+        show_toast("列表为空")
+    def remove_word(self, word_id):
+        data = self.ids.detail_list.data
+        for i, item in enumerate(data):
+            if item['word_id'] == word_id:
+                data.pop(i)
+                break
+
+class SearchScreen(PagedListScreen):
+    # 边输入边搜：停止输入 SEARCH_DELAY 秒后才查询，旧查询的结果由 generation 丢弃
+    SEARCH_DELAY = 0.15
+    STATUS_NAMES = {0: "新词", 1: "待复习", 2: "已掌握"}
+    list_id = 'result_list'
+    query = ''
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.trigger_search = Clock.create_trigger(self.search, self.SEARCH_DELAY)
+    def on_query(self, text):
+        self.query = text
+        self.trigger_search()
+    def search(self, *args):
+        self.reset_list()
+        self.ids.result_hint.text = ""
+        if self.query.strip(): self.load_page()
+    def fetch_page(self, last_id, callback, on_error):
+        db.call('search_words', self.query, after_id=last_id, limit=self.PAGE_SIZE, callback=callback, on_error=on_error)
+    def item_data(self, w):
+        return {'en_text': w['en'], 'cn_text': w['cn'],
+                'meta_text': f"{w['library']}  ·  {self.STATUS_NAMES.get(w['status'], '')}"}
+    def on_empty(self):
+        self.ids.result_hint.text = "没有找到匹配的单词"
 
 class StudyScreen(Screen):
+    # 连续背诵模式：本组剩余不足 PREFETCH_AT 张时在后台取下一组并提前生成卡片数据，
+    # 本组背完直接换上下一组。本组未评分的单词作为 exclude 传给查询；已评分的单词被排到至少一天后，
+    # 不会再到期，session_ids 再兜底过滤一次
+    PREFETCH_AT = 3
     initial_count = 0
     finished_count = 0
+    batch_no = 0
+    session = 0
+    next_batch = None
+    prefetching = False
+    waiting = False
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.session_ids = set()
     def load_words(self):
-        container = self.ids.list_container
-        container.clear_widgets()
-        app = MDApp.get_running_app()
-        limit = app.batch_limit
-        words = db.get_words(mode='random', filter_status=[0, 1], limit=limit)
+        self.ids.study_list.data = []
+        self.session += 1
+        self.session_ids = set()
+        self.batch_no = 0
+        self.next_batch, self.prefetching, self.waiting = None, False, False
+        session = self.session
+        db.call('get_words', mode='due', limit=MDApp.get_running_app().batch_limit,
+                callback=lambda words: self.on_first_batch(session, words))
+    def on_first_batch(self, session, words):
+        if session != self.session: return
         if not words:
             show_toast("暂无需要背诵的单词")
-            self.manager.current = 'home'
+            MDApp.get_running_app().goto('home')
             return
-        self.initial_count = len(words)
+        app = MDApp.get_running_app()
+        self.show_batch([self.card_data(word, app.view_mode) for word in words])
+    def show_batch(self, data):
+        rv = self.ids.study_list
+        self.batch_no += 1
+        self.session_ids.update(item['word_id'] for item in data)
+        self.initial_count = len(data)
         self.finished_count = 0
         self.update_label()
-        for word in words:
-            item = WordListItem(word_data=word, parent_list=container, study_screen=self)
-            container.add_widget(item)
+        rv.data = data
+        rv.scroll_y = 1
+        self.maybe_prefetch()
+    def maybe_prefetch(self):
+        app = MDApp.get_running_app()
+        if not app.continuous_session or self.prefetching or self.next_batch is not None: return
+        if self.initial_count - self.finished_count > self.PREFETCH_AT: return
+        self.prefetching = True
+        session, view_mode = self.session, app.view_mode
+        exclude = [item['word_id'] for item in self.ids.study_list.data]
+        db.call('get_words', mode='due', limit=app.batch_limit, exclude=exclude,
+                callback=lambda words: self.on_prefetched(session, view_mode, words))
+    def on_prefetched(self, session, view_mode, words):
+        if session != self.session: return
+        self.prefetching = False
+        self.next_batch = [self.card_data(word, view_mode) for word in words if word['id'] not in self.session_ids]
+        if self.waiting:
+            self.waiting = False
+            self.next_or_finish()
+    def card_data(self, word, view_mode):
+        en_first = view_mode == 'en_to_cn'
+        return {
+            'word_id': word['id'],
+            'main_text': word['en'] if en_first else word['cn'],
+            'sub_text': word['cn'] if en_first else word['en'],
+            'is_revealed': False,
+            'border_color': [1, 0.6, 0, 0.5] if word['status'] == 1 else [0, 0, 0, 0],
+        }
+    def set_revealed(self, index, revealed):
+        data = self.ids.study_list.data
+        if index is not None and index < len(data): data[index]['is_revealed'] = revealed
+    def remove_word(self, word_id):
+        data = self.ids.study_list.data
+        for i, item in enumerate(data):
+            if item['word_id'] == word_id:
+                data.pop(i)
+                self.update_progress()
+                break
     def update_progress(self):
         self.finished_count += 1
         if self.finished_count >= self.initial_count:
-            show_toast("本组学习完成！")
-            self.manager.current = 'home'
-        else: self.update_label()
+            db.flush()
+            if MDApp.get_running_app().continuous_session: self.next_or_finish()
+            else: self.finish("本组学习完成！")
+        else:
+            self.update_label()
+            self.maybe_prefetch()
+    def next_or_finish(self):
+        if self.next_batch is None:
+            # 下一组还在路上（或本组太短还没来得及预取），到达后 on_prefetched 会接着调用这里
+            self.waiting = True
+            self.maybe_prefetch()
+            return
+        data, self.next_batch = self.next_batch, None
+        if data: self.show_batch(data)
+        else: self.finish(f"全部背完！本次共 {len(self.session_ids)} 词")
+    def finish(self, message):
+        show_toast(message)
+        MDApp.get_running_app().goto('home')
     def update_label(self):
         current = self.finished_count + 1
         self.ids.count_label.text = f"{current} / {self.initial_count}"
+        self.ids.title_label.text = f"背诵中 · 第 {self.batch_no} 组" if self.batch_no > 1 else "背诵中"
+
+class DebugScreen(Screen):
+    # 隐藏的调试界面：数据库调用计时的开关、慢查询阈值、统计表与慢查询记录，可导出 JSON
+    def on_enter(self):
+        self.ids.slow_input.text = f"{profiler.slow_ms:g}"
+        self.refresh()
+    def set_slow_ms(self, text):
+        try: value = float(text)
+        except ValueError: return
+        if value <= 0: return
+        profiler.slow_ms = value
+        db.call('set_setting', 'slow_query_ms', f"{value:g}")
+    def refresh(self):
+        snap = profiler.snapshot()
+        lines = [f"自 {snap['since']} 起  ·  慢查询阈值 {snap['slow_ms']:g} ms", ""]
+        lines.append("方法 · 次数 · 平均 ms · 最大 ms · 行数")
+        for name, m in sorted(snap['methods'].items(), key=lambda item: -item[1]['total_ms']):
+            lines.append(f"{name} · {m['calls']} · {m['mean_ms']:.2f} · {m['max_ms']:.1f} · {m['rows']}")
+        if not snap['methods']: lines.append("（暂无记录，打开开关后使用一会儿再刷新）")
+        lines += ["", f"慢调用（最近 {len(snap['slow'])} 条）"]
+        for entry in reversed(snap['slow']):
+            lines.append(f"[{entry['time']}] {entry['method']} {entry['ms']} ms ({entry['thread']})")
+            for q in entry['queries']:
+                lines.append("    " + q['sql'][:300])
+                lines += ["      → " + p for p in q['plan']]
+        self.ids.report.text = "\n".join(lines)
+    def clear(self):
+        profiler.reset()
+        self.refresh()
+    def export(self):
+        try:
+            path = os.path.join(MDApp.get_running_app().user_data_dir, time.strftime("db_profile_%Y%m%d_%H%M%S.json"))
+            profiler.export(path)
+            show_toast(f"已导出: {path}")
+        except OSError as e:
+            show_toast(f"导出失败: {e}")
+
+# --- 10. 主程序 ---
+# 滑动进度的写缓存最长多久落盘一次（秒）；被强杀时最多丢失这段时间内的滑动
+FLUSH_INTERVAL = 3
+# 分块后台维护（清理过期进度、删除已删词库的单词）每块之间的间隔（秒），让滑动等写请求可以插进写线程
+CHUNK_JOB_DELAY = 0.2
+# 某一块失败（例如导入期间库被锁）后重试的间隔（秒）：从 CHUNK_RETRY_DELAY 起每次翻倍，最多 CHUNK_RETRY_MAX
+CHUNK_RETRY_DELAY = 2
+CHUNK_RETRY_MAX = 60
+# 多久检查一次是否空闲、空闲多久（秒，没有触摸）才做一步增量回收
+RECLAIM_INTERVAL = 30
+IDLE_SECONDS = 20
 
-# --- 9. 主程序 ---
 class VocabApp(MDApp):
     view_mode = StringProperty('en_to_cn')
     batch_limit = NumericProperty(20)
+    continuous_session = BooleanProperty(False)
+    profiling = BooleanProperty(False)
+    profile_id = None
+    profile_name = StringProperty('')
+    last_touch = 0
     detail_view_type = StringProperty('')
+    # 导出界面的目标：(词库 id 或 None 表示全部, 显示名, 词数)
+    export_target = (None, '全部词库', 0)
+    # 按需构建的界面：第一次进入时才加载 KV 规则并创建实例
+    LAZY_SCREENS = {
+        'library': LibraryScreen,
+        'import': ImportScreen,
+        'export': ExportScreen,
+        'sync': SyncScreen,
+        'study': StudyScreen,
+        'detail': DetailScreen,
+        'search': SearchScreen,
+        'debug': DebugScreen,
+    }
     def build(self):
+        global db
+        db = DatabaseService('vocab.db', dispatch=on_ui_thread)
+        mark_startup('database')
         self.title = "咩哒单词"
         self.theme_cls.primary_palette = "Indigo"
         self.theme_cls.accent_palette = "Pink"
@@ -950,13 +1799,99 @@ class VocabApp(MDApp):
         for style_name, style_values in self.theme_cls.font_styles.items():
             if style_name != 'Icon': style_values[0] = 'GlobalFont'
         Window.bind(on_request_close=self.on_request_close)
-        return Builder.load_string(KV)
+        Window.bind(on_touch_down=self.on_any_touch)
+        self.chunk_jobs = set()
+        self.chunk_failures = {}
+        root = Builder.load_string(KV)
+        mark_startup('home screen built')
+        return root
     def on_start(self):
+        Clock.schedule_interval(self.flush_db, FLUSH_INTERVAL)
         if self.root:
             home = self.root.get_screen('home')
             home.update_stats()
+        self.load_profile()
+        db.read(lambda d: (d.get_setting('profiling'), d.get_setting('slow_query_ms')), callback=self.load_profiling)
+        Clock.schedule_interval(self.reclaim_space, RECLAIM_INTERVAL)
+        # 上次的后台清理可能没做完
+        self.run_chunks('clean_stale_progress')
+        self.run_chunks('purge_deleted_libraries')
+        Clock.schedule_once(lambda dt: mark_startup('first frame'))
+    def load_profile(self):
+        # 当前学习者的名字和设置；启动和切换学习者后调用
+        db.read(lambda d: (d.profile_id, dict(d.get_profiles()), d.get_setting('continuous_session')), callback=self.on_profile_loaded)
+    def on_profile_loaded(self, result):
+        self.profile_id, names, continuous = result
+        self.profile_name = names.get(self.profile_id, '')
+        self.continuous_session = continuous == '1'
+    def switch_profile(self, profile_id):
+        # 后台导入 / 导出的连接 attach 着当前学习者的进度库，做完再切换
+        if profile_id == self.profile_id: return
+        if any(self.root.has_screen(name) and self.root.get_screen(name).job for name in ('import', 'export')):
+            show_toast("正在导入或导出，请稍后再切换")
+            return
+        db.switch_profile(profile_id, callback=self.on_profile_switched, on_error=lambda e: show_toast(f"切换失败: {e}"))
+    def on_profile_switched(self, profile_id):
+        self.load_profile()
+        self.root.get_screen('home').update_stats()
+        # 新学习者的进度库可能有上次没清理完的过期行
+        self.run_chunks('clean_stale_progress')
+        show_toast("已切换学习者")
+    def open_export(self, library_id, name, total):
+        self.export_target = (library_id, name, total)
+        self.goto('export')
+    def goto(self, name):
+        if not self.root.has_screen(name):
+            load_kv(name)
+            self.root.add_widget(self.LAZY_SCREENS[name]())
+        self.root.current = name
+    def run_chunks(self, method):
+        # 分块的后台维护：method 每次处理一块并返回处理的行数，直到返回 0；同一任务同时只跑一条链
+        if method in self.chunk_jobs: return
+        self.chunk_jobs.add(method)
+        db.call(method, callback=lambda count: self.on_chunk_done(method, count), on_error=lambda e: self.on_chunk_failed(method, e))
+    def on_chunk_done(self, method, count):
+        self.chunk_jobs.discard(method)
+        self.chunk_failures.pop(method, None)
+        if count: Clock.schedule_once(lambda dt: self.run_chunks(method), CHUNK_JOB_DELAY)
+    def on_chunk_failed(self, method, error):
+        # 让出 chunk_jobs（否则这条链和空闲回收都会一直停着），退避后重试
+        self.chunk_jobs.discard(method)
+        failures = self.chunk_failures[method] = self.chunk_failures.get(method, 0) + 1
+        delay = min(CHUNK_RETRY_DELAY * 2 ** (failures - 1), CHUNK_RETRY_MAX)
+        Logger.warning(f"Chunk job {method} failed ({error}), retrying in {delay}s")
+        Clock.schedule_once(lambda dt: self.run_chunks(method), delay)
+    def on_any_touch(self, *args):
+        self.last_touch = time.monotonic()
+    def reclaim_space(self, *args):
+        # 空闲时才回收：一段时间没有触摸，也没有导入和其他后台维护在跑
+        if self.chunk_jobs or time.monotonic() - self.last_touch < IDLE_SECONDS: return
+        if self.root.has_screen('import') and self.root.get_screen('import').job: return
+        db.call('reclaim_space')
+    def flush_db(self, *args):
+        db.flush()
+    def on_pause(self):
+        # 进入后台后随时可能被杀，等缓存真正落盘再返回
+        db.flush(wait=True)
+        return True
+    def on_stop(self):
+        db.flush(wait=True)
     def on_request_close(self, *args):
+        db.flush(wait=True)
         return False
+    def load_profiling(self, settings):
+        enabled, slow_ms = settings
+        if slow_ms: profiler.slow_ms = float(slow_ms)
+        if enabled == '1': self.set_profiling(True)
+    def set_profiling(self, value):
+        if bool(value) == self.profiling: return
+        self.profiling = bool(value)
+        db.set_profiling(self.profiling)
+        db.call('set_setting', 'profiling', '1' if value else '0')
+    def set_continuous_session(self, value):
+        if bool(value) == self.continuous_session: return
+        self.continuous_session = bool(value)
+        db.call('set_setting', 'continuous_session', '1' if value else '0')
     def switch_theme(self):
         self.theme_cls.theme_style = "Dark" if self.theme_cls.theme_style == "Light" else "Light"
     def toggle_view_mode(self):
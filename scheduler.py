@@ -0,0 +1,26 @@
+import time
+
+# --- SM-2 间隔重复调度 ---
+# 评分 0~5，低于 3 视为没记住：从头开始，间隔回到 1 天，难度系数不变；
+# 左滑“熟知”记 5 分，右滑“模糊”记 2 分
+
+GRADE_KNOWN = 5
+GRADE_FUZZY = 2
+DAY = 86400
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def review(interval, ease, reps, grade, now=None):
+    # 返回 (interval, ease, reps, due_at, status)；interval 单位为天，due_at 为 Unix 秒
+    now = int(time.time()) if now is None else now
+    if grade < 3:
+        reps, interval = 0, 1
+    else:
+        reps += 1
+        if reps == 1: interval = 1
+        elif reps == 2: interval = 6
+        else: interval = max(1, round(interval * ease))
+        ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    status = 2 if grade >= 3 else 1
+    return interval, ease, reps, now + interval * DAY, status
@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+
+# --- 设备间同步文件 ---
+# 学习进度的增量交换文件：gzip 压缩的 JSON，内容是 DatabaseManager.get_changes 的结果加上格式标记。
+# 一台设备导出、拷到另一台设备导入合并，不经过服务器；单词按 (词库名, 英文) 对应，
+# 两台设备各自导入的词库 id 不同也能合并
+
+SYNC_EXT = '.mdsync'
+FORMAT = 'mieda-vocab-sync'
+VERSION = 1
+
+
+def write_changes(path, changes):
+    # 先写到 .part 临时文件，写完才改名；返回写出的改动条数
+    part = path + '.part'
+    try:
+        with gzip.open(part, 'wt', encoding='utf-8') as f:
+            json.dump(dict(changes, format=FORMAT, version=VERSION), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part): os.remove(part)
+        raise
+    return len(changes['libraries']) + len(changes['words'])
+
+
+def read_changes(path):
+    # 校验格式标记和版本，不合格抛 ValueError
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, EOFError, ValueError):
+        raise ValueError("不是同步文件或文件已损坏")
+    if not isinstance(data, dict) or data.get('format') != FORMAT: raise ValueError("不是同步文件")
+    if data.get('version', 0) > VERSION: raise ValueError(f"同步文件版本 {data['version']} 过新，请升级应用")
+    return data
+
+
+def export_changes(db, path, full=False):
+    # db 是 DatabaseManager，在它所属的线程上调用。默认只写上次导出以来的改动，full 时写出全部改动过的进度；
+    # 没有改动时不写文件，返回 0。文件写好才记下导出位置，写失败下次还会带上这些改动
+    changes = db.get_changes(0 if full else None)
+    if not changes['libraries'] and not changes['words']: return 0
+    count = write_changes(path, changes)
+    db.mark_exported(changes['upto'])
+    return count
+
+
+def import_changes(db, path):
+    # 返回 DatabaseManager.merge_changes 的 (合并的条数, 跳过的条数, 是否缺了之前的同步文件)
+    return db.merge_changes(read_changes(path))
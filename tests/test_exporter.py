@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporter import export_words
+from importer import iter_rows, iter_export_records
+
+# 以公式字符开头的单词导出再导入后要原样还原，不能被表格软件当成公式
+WORDS = ['=SUM(A1:A2)', '+plus', '-minus', '@at', "'tis", "'=quoted", 'plain']
+
+
+def rows():
+    return [('词库', en, f'中文{i}', 1, 2, 2.5, 3, 1700000000, None) for i, en in enumerate(WORDS)]
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.xlsx'])
+def test_formula_round_trip(tmp_path, ext):
+    if ext == '.xlsx': pytest.importorskip('openpyxl')
+    path = str(tmp_path / f'out{ext}')
+    assert export_words(path, iter(rows())) == len(WORDS)
+    records = list(iter_export_records(iter_rows(path), quoted=ext == '.csv'))
+    assert [r[1] for r in records] == WORDS
+    assert [r[2] for r in records] == [f'中文{i}' for i in range(len(WORDS))]
+    assert all(r[4] == (1, 2, 2.5, 3, 1700000000) for r in records)
+
+
+def test_csv_cells_are_not_formulas(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    export_words(path, iter(rows()))
+    cells = [row[1] for row in iter_rows(path)][1:]
+    assert not any(cell.startswith(('=', '+', '-', '@')) for cell in cells)
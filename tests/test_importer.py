@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importer import detect_columns, iter_word_pairs
+
+
+def test_detect_non_ascii_words():
+    rows = [['单词', '释义'], ['café', '咖啡馆'], ['naïve', '天真的'], ['Zürich', '苏黎世'], ['3D', '三维']]
+    assert detect_columns(rows) == (0, 1)
+    assert [p[0] for p in iter_word_pairs(rows)] == ['café', 'naïve', 'Zürich', '3D']
+
+
+def test_detect_skips_numbered_column():
+    # 序号列是纯数字，平均长度再短也不能当成英文列
+    rows = [['序号', '单词', '释义']] + [[str(i + 1), word, cn] for i, (word, cn) in enumerate(
+        [('apple', '苹果'), ('banana', '香蕉'), ('cherry', '樱桃'), ('grape', '葡萄')])]
+    assert detect_columns(rows) == (1, 2)
+    assert [p[:2] for p in iter_word_pairs(rows, keep_extra=False)] == [('apple', '苹果'), ('banana', '香蕉'), ('cherry', '樱桃'), ('grape', '葡萄')]
+
+
+def test_detect_failure_raises():
+    with pytest.raises(ValueError):
+        list(iter_word_pairs([['猫', '狗'], ['鱼', '鸟']]))
@@ -0,0 +1,36 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+
+def make_baseline_db(path):
+    # 发布版（拆库之前、没有 user_version）的表结构：进度直接存在 words.status 里
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE libraries (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, is_active INTEGER DEFAULT 1)")
+    conn.execute("CREATE TABLE words (id INTEGER PRIMARY KEY AUTOINCREMENT, english TEXT, chinese TEXT, status INTEGER DEFAULT 0, library_id INTEGER DEFAULT 1)")
+    conn.execute("INSERT INTO libraries (name, is_active) VALUES ('四级', 1)")
+    conn.executemany("INSERT INTO words (english, chinese, status, library_id) VALUES (?, ?, ?, 1)",
+                     [(f'w{i}', f'词{i}', 1 + i % 2 if i < 6 else 0) for i in range(20)])
+    conn.commit()
+    conn.close()
+
+
+def test_upgraded_progress_is_exported(tmp_path):
+    path = str(tmp_path / 'vocab.db')
+    make_baseline_db(path)
+    db = DatabaseManager(path)
+    changes = db.get_changes(0)
+    assert sorted(w[1] for w in changes['words']) == [f'w{i}' for i in range(6)]
+    assert {w[2] for w in changes['words']} == {1, 2}
+    # 另一台设备导入同样的词库后能合并到这些进度
+    other = DatabaseManager(str(tmp_path / 'other.db'))
+    lib = other.add_library('四级')
+    other.bulk_add_words([(f'w{i}', f'词{i}') for i in range(20)], lib)
+    merged, skipped, gap = other.merge_changes(changes)
+    assert merged == 6
+    assert other.get_stats()['new'] == 14
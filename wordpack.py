@@ -0,0 +1,183 @@
+import argparse
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from importer import iter_rows, iter_word_pairs, parse_columns, is_export_header, iter_export_records
+
+# --- 词库包（.wpk）---
+# 预先做好的词库的紧凑二进制格式，导入时 mmap 打开直接按偏移取字符串，不经过表格解析。
+# 布局（小端）：
+#   文件头  magic 'MDWP' | 版本 u16 | 保留 u16 | 单词数 u32 | 偏移表位置 u32 | CRC32 u32
+#   词库名  u16 长度 + UTF-8
+#   单词    每个单词依次是 english、chinese、extra（JSON，没有时长度为 0），各自 u16 长度 + UTF-8
+#   偏移表  单词数个 u32，第 i 个单词在文件中的起始位置
+# CRC32 覆盖文件头之后的全部字节
+
+MAGIC = b'MDWP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+LENGTH = struct.Struct('<H')
+OFFSET = struct.Struct('<I')
+PACK_EXT = '.wpk'
+PROGRESS_EVERY = 1000
+
+
+class PackWriter:
+    # 流式写：单词边来边写，只在内存里留偏移表（每词 4 字节），最后回填文件头
+    def __init__(self, path, name):
+        self.f = open(path, 'wb')
+        self.offsets = array('I')
+        self.crc = 0
+        self.pos = HEADER.size
+        self.f.write(b'\0' * HEADER.size)
+        self.write_strings(name)
+
+    def write_strings(self, *texts):
+        encoded = [t.encode('utf-8') for t in texts]
+        if any(len(b) > 0xFFFF for b in encoded): raise ValueError(f"单词内容过长: {texts[0][:20]}")
+        data = b''.join(LENGTH.pack(len(b)) + b for b in encoded)
+        self.f.write(data)
+        self.crc = zlib.crc32(data, self.crc)
+        self.pos += len(data)
+
+    def add(self, english, chinese, extra=None):
+        self.offsets.append(self.pos)
+        self.write_strings(english, chinese, json.dumps(extra, ensure_ascii=False) if extra else '')
+
+    def close(self):
+        table_pos = self.pos
+        if table_pos > 0xFFFFFFFF: raise ValueError("词库包过大")
+        if sys.byteorder == 'big': self.offsets.byteswap()
+        table = self.offsets.tobytes()
+        self.f.write(table)
+        self.crc = zlib.crc32(table, self.crc)
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, 0, len(self.offsets), table_pos, self.crc))
+        self.f.close()
+        return len(self.offsets)
+
+
+class WordPack:
+    # mmap 打开的只读词库包；pack[i] 按偏移表随机取第 i 个单词，迭代时顺序读。
+    # 打开时校验 magic、版本和 CRC32，不合格抛 ValueError
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        try:
+            if os.fstat(self.f.fileno()).st_size < HEADER.size: raise ValueError("不是词库包文件")
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.f.close()
+            raise
+        try:
+            magic, self.version, _, self.count, self.table_pos, crc = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC: raise ValueError("不是词库包文件")
+            if self.version > VERSION: raise ValueError(f"词库包版本 {self.version} 过新，请升级应用")
+            if self.table_pos + OFFSET.size * self.count != len(self.mm): raise ValueError("词库包已损坏（长度不符）")
+            with memoryview(self.mm) as view:
+                if zlib.crc32(view[HEADER.size:]) != crc: raise ValueError("词库包已损坏（校验失败）")
+            self.name, _ = self.read_string(HEADER.size)
+        except Exception:
+            self.close()
+            raise
+
+    def read_string(self, pos):
+        (length,) = LENGTH.unpack_from(self.mm, pos)
+        start = pos + LENGTH.size
+        return self.mm[start:start + length].decode('utf-8'), start + length
+
+    def read_word(self, pos):
+        english, pos = self.read_string(pos)
+        chinese, pos = self.read_string(pos)
+        extra, pos = self.read_string(pos)
+        return (english, chinese, json.loads(extra) if extra else None), pos
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count: raise IndexError(i)
+        (pos,) = OFFSET.unpack_from(self.mm, self.table_pos + OFFSET.size * i)
+        return self.read_word(pos)[0]
+
+    def __iter__(self):
+        # 单词按写入顺序紧挨着存放，顺序读时不用查偏移表
+        pos = self.read_string(HEADER.size)[1]
+        for _ in range(self.count):
+            word, pos = self.read_word(pos)
+            yield word
+
+    def iter_words(self, on_progress=None):
+        # 同 __iter__，on_progress(fraction) 每 PROGRESS_EVERY 个单词回调一次
+        for i, word in enumerate(self):
+            if on_progress and i % PROGRESS_EVERY == 0: on_progress(i / self.count)
+            yield word
+
+    def close(self):
+        if getattr(self, 'mm', None) is not None: self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_pack(path, name, words):
+    # words 的元素是 (english, chinese) 或 (english, chinese, extra)；返回写入的单词数
+    writer = PackWriter(path, name)
+    try:
+        for word in words: writer.add(*word[:3])
+        return writer.close()
+    except BaseException:
+        writer.f.close()
+        os.remove(path)
+        raise
+
+
+# --- 转换命令行 ---
+# python wordpack.py build 四级.xlsx [-o 四级.wpk] [--name 四级] [--columns A,B]
+# python wordpack.py info 四级.wpk
+
+def build(args):
+    rows = iter_rows(args.source)
+    head = list(itertools.islice(rows, 1))
+    rows = itertools.chain(head, rows)
+    # 本应用导出的文件只取单词内容，进度不进词库包
+    if head and is_export_header(head[0]): words = (r[1:4] for r in iter_export_records(rows, args.source.lower().endswith('.csv')))
+    else: words = iter_word_pairs(rows, parse_columns(args.columns or ''))
+    base = os.path.splitext(args.source)[0]
+    out = args.out or base + PACK_EXT
+    count = write_pack(out, args.name or os.path.basename(base), words)
+    print(f"已写入 {out}: {count} 词, {os.path.getsize(out)} 字节")
+
+
+def info(args):
+    with WordPack(args.pack) as pack:
+        print(f"{pack.name}: {len(pack)} 词, 版本 {pack.version}")
+        for i in range(min(len(pack), 5)): print("  ", pack[i])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build')
+    b.add_argument('source')
+    b.add_argument('-o', '--out')
+    b.add_argument('--name')
+    b.add_argument('--columns')
+    i = sub.add_parser('info')
+    i.add_argument('pack')
+    args = parser.parse_args()
+    if args.command == 'build': build(args)
+    else: info(args)
+
+
+if __name__ == '__main__':
+    main()